@@ -1,14 +1,21 @@
 import duckdb
+import numpy as np
 import pandas as pd
 import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from faker import Faker
 
+from dropoff_index import customer_locations, load_dropoff_locations
+from stage_stats import DEFAULT_STATS_TABLE, StageStats
+
 fake = Faker()
 
 # Configuration
 UPDATE_BATCH_SIZE = 1000  # Number of records to update per batch
 NEW_RECORDS_BATCH_SIZE = 500  # Number of new records to add per batch
+NEW_PRODUCTS_BATCH_SIZE = NEW_RECORDS_BATCH_SIZE // 2  # Fewer new products than customers
 
 # Nepal-specific data (same as original script)
 NEPAL_FIRST_NAMES = [
@@ -46,16 +53,191 @@ PRODUCT_CATEGORIES = {
 ORDER_STATUSES = ['pending', 'confirmed', 'shipped', 'delivered', 'cancelled', 'returned']
 PAYMENT_METHODS = ['eSewa', 'Khalti', 'IME Pay', 'Cash on Delivery', 'Bank Transfer', 'Credit Card', 'Debit Card']
 
+UPDATE_EMAIL_DOMAINS = ['gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com']
+
+# Status transitions: current status -> (probability of moving on, possible next statuses)
+ORDER_STATUS_TRANSITIONS = {
+    'pending': (0.7, ['confirmed', 'cancelled']),
+    'confirmed': (0.8, ['shipped']),
+    'shipped': (0.9, ['delivered'])
+}
+
+# Tables whose changes are recorded in the change log, with their key column.
+# Order items and payments are only ever inserted, by order_stream.py
+CDC_ENTITIES = {
+    'customers': 'customer_id',
+    'products': 'product_id',
+    'orders': 'order_id',
+    'order_items': 'order_item_id',
+    'payments': 'payment_id'
+}
+
+# Append-only change-data-capture log: one row per inserted or updated entity,
+# holding the full row image before and after the change as JSON
+CHANGE_LOG_DDL = """
+    CREATE TABLE IF NOT EXISTS change_log (
+        change_id BIGINT,
+        batch_timestamp TIMESTAMP,
+        entity VARCHAR,
+        entity_key INTEGER,
+        operation VARCHAR,
+        before_values JSON,
+        after_values JSON
+    )
+"""
+
+def _sql_list(values):
+    return '[' + ', '.join("'" + value.replace("'", "''") + "'" for value in values) + ']'
+
+def _pick(values):
+    """SQL expression choosing one of values uniformly at random per row"""
+    return f"{_sql_list(values)}[1 + floor(random() * {len(values)})::INTEGER]"
+
+def _row_structure(conn, table_name):
+    """JSON structure for from_json that restores a table's column types, quoted for a SQL literal"""
+    columns = conn.execute("""
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_name = ?
+        ORDER BY ordinal_position
+    """, [table_name]).fetchall()
+    # ENUM types spell out their values in quotes, e.g. ENUM('Male', 'Female')
+    structure = '{' + ', '.join(f'"{name}": "{data_type}"' for name, data_type in columns) + '}'
+    return structure.replace("'", "''")
+
+def replay_change_log(conn, source='change_log', until=None):
+    """Apply a recorded change log to a base database at full speed.
+
+    Changes are collapsed to the latest after-image per key, so each entity
+    needs one UPDATE and one INSERT no matter how many batches were recorded.
+    `source` is any relation holding the log, e.g. the output of
+    export_change_log read back with read_parquet(); `until` stops at a batch
+    timestamp to rebuild an intermediate state.
+    """
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        for entity, key in CDC_ENTITIES.items():
+            conn.execute(f"""
+                CREATE OR REPLACE TEMP TABLE replay_rows AS
+                SELECT unnest(from_json(after_values, '{_row_structure(conn, entity)}'))
+                FROM (
+                    SELECT after_values
+                    FROM {source}
+                    WHERE entity = ?
+                      AND (?::TIMESTAMP IS NULL OR batch_timestamp <= ?::TIMESTAMP)
+                    QUALIFY row_number() OVER (PARTITION BY entity_key ORDER BY change_id DESC) = 1
+                )
+            """, [entity, until, until])
+
+            columns = [row[0] for row in conn.execute(f"DESCRIBE {entity}").fetchall() if row[0] != key]
+            conn.execute(f"""
+                UPDATE {entity}
+                SET {', '.join(f'{column} = r.{column}' for column in columns)}
+                FROM replay_rows r
+                WHERE {entity}.{key} = r.{key}
+            """)
+            conn.execute(f"""
+                INSERT INTO {entity}
+                SELECT r.* FROM replay_rows r
+                ANTI JOIN {entity} t ON t.{key} = r.{key}
+            """)
+            count = conn.execute("SELECT COUNT(*) FROM replay_rows").fetchone()[0]
+            conn.execute("DROP TABLE replay_rows")
+            print(f"Replayed {count} {entity} changes")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
 class SCD2DataGenerator:
-    def __init__(self, db_path='nepal_ecommerce.duckdb'):
+    def __init__(self, db_path='nepal_ecommerce.duckdb', log_changes=True,
+                 stats_table=DEFAULT_STATS_TABLE, stats_jsonl=None):
         self.db_path = db_path
         self.conn = duckdb.connect(db_path)
+        self.log_changes = log_changes
+        if log_changes:
+            self.conn.execute(CHANGE_LOG_DDL)
+        # Stage timings are written to stats_table (unless None) and stats_jsonl on close()
+        self.stats = StageStats('SCD2_data_generator')
+        self.stats_table = stats_table
+        self.stats_jsonl = stats_jsonl
+        self.dropoffs = load_dropoff_locations()
         
     def get_table_max_id(self, table_name, id_column):
         """Get the maximum ID from a table"""
         result = self.conn.execute(f"SELECT MAX({id_column}) FROM {table_name}").fetchone()
         return result[0] if result[0] is not None else 0
     
+    def _execute_stage(self, stage, sql, params=None):
+        """Run one statement as a stage, counting the rows it wrote"""
+        with self.stats.stage(stage) as record:
+            record['rows'] = self.conn.execute(sql, params).fetchone()[0]
+    
+    def _drop_temp_table(self, table_name):
+        """Drop a temporary update table, returning how many rows it held"""
+        count = self.conn.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]
+        self.conn.execute(f"DROP TABLE {table_name}")
+        return count
+    
+    def _capture_before(self, entity, updates_table):
+        """Keep the pre-update image of the rows an update is about to change"""
+        if not self.log_changes:
+            return
+        key = CDC_ENTITIES[entity]
+        self._execute_stage(f'capture_{entity}', f"""
+            CREATE OR REPLACE TEMP TABLE {entity}_before AS
+            SELECT t.* FROM {entity} t
+            SEMI JOIN {updates_table} u ON t.{key} = u.{key}
+        """)
+    
+    def _append_changes(self, entity, operation, batch_timestamp, select_sql):
+        """Append rows of (entity_key, before_values, after_values) to the change log"""
+        next_change_id = self.conn.execute("SELECT COALESCE(MAX(change_id), 0) FROM change_log").fetchone()[0]
+        self._execute_stage(f'log_{entity}_{operation}s', f"""
+            INSERT INTO change_log
+            SELECT
+                {next_change_id} + row_number() OVER (ORDER BY changes.entity_key),
+                ?::TIMESTAMP,
+                '{entity}',
+                changes.entity_key,
+                '{operation}',
+                changes.before_values,
+                changes.after_values
+            FROM ({select_sql}) changes
+        """, [batch_timestamp])
+    
+    def _log_updates(self, entity, batch_timestamp):
+        """Log rows captured by _capture_before whose values actually changed"""
+        if not self.log_changes:
+            return
+        key = CDC_ENTITIES[entity]
+        self._append_changes(entity, 'update', batch_timestamp, f"""
+            SELECT b.{key} AS entity_key, to_json(b) AS before_values, to_json(a) AS after_values
+            FROM {entity}_before b
+            JOIN {entity} a ON a.{key} = b.{key}
+            WHERE b IS DISTINCT FROM a
+        """)
+        self.conn.execute(f"DROP TABLE {entity}_before")
+    
+    def _log_inserts(self, entity, batch_timestamp, after_id):
+        """Log rows inserted with keys above after_id"""
+        if not self.log_changes:
+            return
+        key = CDC_ENTITIES[entity]
+        self._append_changes(entity, 'insert', batch_timestamp, f"""
+            SELECT {key} AS entity_key, NULL::JSON AS before_values, to_json(t) AS after_values
+            FROM {entity} t
+            WHERE {key} > {after_id}
+        """)
+    
+    def export_change_log(self, output_dir='changes'):
+        """Write the change log as Parquet change files, one directory per entity"""
+        self._execute_stage('export_change_log', f"""
+            COPY (SELECT * FROM change_log ORDER BY change_id)
+            TO '{output_dir}' (FORMAT parquet, PARTITION_BY (entity), OVERWRITE_OR_IGNORE)
+        """)
+        print(f"Change log exported to '{output_dir}/'")
+    
     def update_customer_data(self, update_timestamp=None):
         """Generate customer updates for SCD2 testing"""
         if update_timestamp is None:
@@ -63,69 +245,58 @@ class SCD2DataGenerator:
             
         print(f"Generating customer updates for timestamp: {update_timestamp}")
         
-        # Get random customers to update
-        customers = self.conn.execute(f"""
-            SELECT customer_id, first_name, last_name, email, phone, gender
-            FROM customers 
-            ORDER BY RANDOM() 
-            LIMIT {UPDATE_BATCH_SIZE}
-        """).fetchall()
-        
-        updates = []
-        for customer in customers:
-            customer_id, first_name, last_name, email, phone, gender = customer
-            
-            # Randomly decide what to update (multiple changes possible)
-            update_fields = {}
-            
-            # 30% chance to update phone number
-            if random.random() < 0.3:
-                update_fields['phone'] = f"+977-{random.randint(980, 989)}-{random.randint(1000000, 9999999)}"
-            
-            # 20% chance to update email
-            if random.random() < 0.2:
-                email_domain = random.choice(['gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com'])
-                update_fields['email'] = f"{first_name.lower()}.{last_name.lower()}{random.randint(100, 999)}@{email_domain}"
-            
-            # 10% chance to update first name (marriage, etc.)
-            if random.random() < 0.1:
-                update_fields['first_name'] = random.choice(NEPAL_FIRST_NAMES)
-            
-            # 5% chance to update last name (marriage)
-            if random.random() < 0.05:
-                update_fields['last_name'] = random.choice(NEPAL_LAST_NAMES)
-            
-            if update_fields:
-                update_fields['customer_id'] = customer_id
-                update_fields['updated_at'] = update_timestamp
-                updates.append(update_fields)
-        
-        if updates:
-            # Create temporary table with updates
-            updates_df = pd.DataFrame(updates)
-            self.conn.execute("DROP TABLE IF EXISTS temp_customer_updates")
-            self.conn.execute("""
-                CREATE TABLE temp_customer_updates AS 
-                SELECT * FROM updates_df
-            """)
-            
-            # Apply updates
-            update_sql = """
-                UPDATE customers 
-                SET first_name = COALESCE(temp.first_name, customers.first_name),
-                    last_name = COALESCE(temp.last_name, customers.last_name),
-                    email = COALESCE(temp.email, customers.email),
-                    phone = COALESCE(temp.phone, customers.phone),
-                    updated_at = temp.updated_at
-                FROM temp_customer_updates temp
-                WHERE customers.customer_id = temp.customer_id
-            """
-            self.conn.execute(update_sql)
-            self.conn.execute("DROP TABLE temp_customer_updates")
-            
-            print(f"Updated {len(updates)} customer records")
+        # Sample random customers and decide every change in one set-based pass.
+        # Multiple changes per customer are possible; the email is built from
+        # the names as they were before this batch.
+        self._execute_stage('sample_customer_updates', f"""
+            CREATE OR REPLACE TEMP TABLE customer_updates AS
+            WITH sampled AS (
+                SELECT
+                    customer_id,
+                    first_name,
+                    last_name,
+                    random() < 0.3 AS change_phone,       -- 30% chance to update phone number
+                    random() < 0.2 AS change_email,       -- 20% chance to update email
+                    random() < 0.1 AS change_first_name,  -- 10% chance to update first name (marriage, etc.)
+                    random() < 0.05 AS change_last_name   -- 5% chance to update last name (marriage)
+                FROM customers
+                USING SAMPLE reservoir({int(UPDATE_BATCH_SIZE)} ROWS)
+            )
+            SELECT
+                customer_id,
+                CASE WHEN change_first_name THEN {_pick(NEPAL_FIRST_NAMES)} END AS first_name,
+                CASE WHEN change_last_name THEN {_pick(NEPAL_LAST_NAMES)} END AS last_name,
+                CASE WHEN change_email THEN
+                    lower(first_name) || '.' || lower(last_name) || (100 + floor(random() * 900))::INTEGER
+                    || '@' || {_pick(UPDATE_EMAIL_DOMAINS)}
+                END AS email,
+                CASE WHEN change_phone THEN
+                    '+977-' || (980 + floor(random() * 10))::INTEGER || '-' || (1000000 + floor(random() * 9000000))::INTEGER
+                END AS phone,
+                ?::TIMESTAMP AS updated_at
+            FROM sampled
+            WHERE change_phone OR change_email OR change_first_name OR change_last_name
+        """, [update_timestamp])
         
-        return len(updates)
+        # Apply updates
+        self._capture_before('customers', 'customer_updates')
+        self._execute_stage('update_customers', """
+            UPDATE customers 
+            SET first_name = COALESCE(temp.first_name, customers.first_name),
+                last_name = COALESCE(temp.last_name, customers.last_name),
+                email = COALESCE(temp.email, customers.email),
+                phone = COALESCE(temp.phone, customers.phone),
+                updated_at = temp.updated_at
+            FROM customer_updates temp
+            WHERE customers.customer_id = temp.customer_id
+        """)
+        self._log_updates('customers', update_timestamp)
+        num_updates = self._drop_temp_table('customer_updates')
+        
+        if num_updates:
+            print(f"Updated {num_updates} customer records")
+        
+        return num_updates
     
     def update_product_data(self, update_timestamp=None):
         """Generate product updates for SCD2 testing"""
@@ -134,80 +305,76 @@ class SCD2DataGenerator:
             
         print(f"Generating product updates for timestamp: {update_timestamp}")
         
-        # Get random products to update
-        products = self.conn.execute(f"""
-            SELECT product_id, name, category, price, cost
-            FROM products 
-            ORDER BY RANDOM() 
-            LIMIT {UPDATE_BATCH_SIZE}
-        """).fetchall()
-        
-        updates = []
-        for product in products:
-            product_id, name, category, price, cost = product
-            
-            update_fields = {}
-            
-            # 50% chance to update price (common in e-commerce)
-            if random.random() < 0.5:
-                # Price change between -20% to +30%
-                price_change = random.uniform(-0.2, 0.3)
-                new_price = price * (1 + price_change)
-                update_fields['price'] = round(max(new_price, 50), 2)  # Minimum price 50 NPR
-            
-            # 30% chance to update cost (supplier changes)
-            if random.random() < 0.3:
-                cost_change = random.uniform(-0.15, 0.25)
-                new_cost = cost * (1 + cost_change)
-                update_fields['cost'] = round(max(new_cost, 20), 2)  # Minimum cost 20 NPR
-            
-            # 10% chance to update category/subcategory
-            if random.random() < 0.1:
-                new_category = random.choice(list(PRODUCT_CATEGORIES.keys()))
-                new_subcategory = random.choice(PRODUCT_CATEGORIES[new_category])
-                update_fields['category'] = new_category
-                update_fields['subcategory'] = new_subcategory
-            
-            # 15% chance to update brand
-            if random.random() < 0.15:
-                update_fields['brand'] = random.choice(BRANDS)
-            
-            if update_fields:
-                update_fields['product_id'] = product_id
-                updates.append(update_fields)
-        
-        if updates:
-            updates_df = pd.DataFrame(updates)
-            self.conn.execute("DROP TABLE IF EXISTS temp_product_updates")
-            self.conn.execute("CREATE TABLE temp_product_updates AS SELECT * FROM updates_df")
-            
-            update_sql = """
-                UPDATE products 
-                SET price = COALESCE(temp.price, products.price),
-                    cost = COALESCE(temp.cost, products.cost),
-                    category = COALESCE(temp.category, products.category),
-                    subcategory = COALESCE(temp.subcategory, products.subcategory),
-                    brand = COALESCE(temp.brand, products.brand)
-                FROM temp_product_updates temp
-                WHERE products.product_id = temp.product_id
-            """
-            self.conn.execute(update_sql)
-            self.conn.execute("DROP TABLE temp_product_updates")
-            
-            print(f"Updated {len(updates)} product records")
+        categories = list(PRODUCT_CATEGORIES.keys())
+        subcategories = '[' + ', '.join(_sql_list(PRODUCT_CATEGORIES[c]) for c in categories) + ']'
+        
+        self._execute_stage('sample_product_updates', f"""
+            CREATE OR REPLACE TEMP TABLE product_updates AS
+            WITH sampled AS (
+                SELECT
+                    product_id,
+                    price,
+                    cost,
+                    random() < 0.5 AS change_price,     -- 50% chance to update price (common in e-commerce)
+                    random() < 0.3 AS change_cost,      -- 30% chance to update cost (supplier changes)
+                    random() < 0.1 AS change_category,  -- 10% chance to update category/subcategory
+                    random() < 0.15 AS change_brand,    -- 15% chance to update brand
+                    1 + floor(random() * {len(categories)})::INTEGER AS category_idx
+                FROM products
+                USING SAMPLE reservoir({int(UPDATE_BATCH_SIZE)} ROWS)
+            )
+            SELECT
+                product_id,
+                -- Price change between -20% to +30%, minimum price 50 NPR
+                CASE WHEN change_price THEN ROUND(GREATEST(price * (0.8 + random() * 0.5), 50), 2) END AS price,
+                -- Cost change between -15% to +25%, minimum cost 20 NPR
+                CASE WHEN change_cost THEN ROUND(GREATEST(cost * (0.85 + random() * 0.4), 20), 2) END AS cost,
+                CASE WHEN change_category THEN {_sql_list(categories)}[category_idx] END AS category,
+                CASE WHEN change_category THEN
+                    list_element({subcategories}[category_idx],
+                                 1 + floor(random() * len({subcategories}[category_idx]))::INTEGER)
+                END AS subcategory,
+                CASE WHEN change_brand THEN {_pick(BRANDS)} END AS brand
+            FROM sampled
+            WHERE change_price OR change_cost OR change_category OR change_brand
+        """)
+        
+        self._capture_before('products', 'product_updates')
+        self._execute_stage('update_products', """
+            UPDATE products 
+            SET price = COALESCE(temp.price, products.price),
+                cost = COALESCE(temp.cost, products.cost),
+                category = COALESCE(temp.category, products.category),
+                subcategory = COALESCE(temp.subcategory, products.subcategory),
+                brand = COALESCE(temp.brand, products.brand)
+            FROM product_updates temp
+            WHERE products.product_id = temp.product_id
+        """)
+        self._log_updates('products', update_timestamp)
+        num_updates = self._drop_temp_table('product_updates')
         
-        return len(updates)
+        if num_updates:
+            print(f"Updated {num_updates} product records")
+        
+        return num_updates
     
-    def add_new_customers(self, add_timestamp=None):
-        """Add new customers"""
-        if add_timestamp is None:
-            add_timestamp = datetime.now()
-            
-        max_customer_id = self.get_table_max_id('customers', 'customer_id')
+    def _insert_new_rows(self, entity, df, add_timestamp):
+        """Insert planned new rows and record them in the change log"""
+        key = CDC_ENTITIES[entity]
+        with self.stats.stage(f'insert_{entity}', rows=len(df)):
+            self.conn.execute(f"INSERT INTO {entity} SELECT * FROM df")
+        self._log_inserts(entity, add_timestamp, int(df[key].min()) - 1)
+        print(f"Added {len(df)} new {entity}")
+        return len(df)
+    
+    def _new_customers_df(self, start_id, add_timestamp):
+        """Build a batch of new customers with ids from start_id"""
         new_customers = []
+        latitude, longitude = customer_locations(
+            np.random.default_rng(random.getrandbits(64)), NEW_RECORDS_BATCH_SIZE, self.dropoffs)
         
         for i in range(NEW_RECORDS_BATCH_SIZE):
-            customer_id = max_customer_id + i + 1
+            customer_id = start_id + i
             first_name = random.choice(NEPAL_FIRST_NAMES)
             last_name = random.choice(NEPAL_LAST_NAMES)
             
@@ -224,26 +391,29 @@ class SCD2DataGenerator:
                 'phone': phone,
                 'date_of_birth': birth_date,
                 'gender': random.choice(['Male', 'Female']),
+                'latitude': latitude[i],
+                'longitude': longitude[i],
                 'created_at': add_timestamp,
                 'updated_at': add_timestamp
             })
         
-        customers_df = pd.DataFrame(new_customers)
-        self.conn.execute("INSERT INTO customers SELECT * FROM customers_df")
-        print(f"Added {len(new_customers)} new customers")
-        
-        return len(new_customers)
+        return pd.DataFrame(new_customers)
     
-    def add_new_products(self, add_timestamp=None):
-        """Add new products"""
+    def add_new_customers(self, add_timestamp=None):
+        """Add new customers"""
         if add_timestamp is None:
             add_timestamp = datetime.now()
             
-        max_product_id = self.get_table_max_id('products', 'product_id')
+        max_customer_id = self.get_table_max_id('customers', 'customer_id')
+        customers_df = self._new_customers_df(max_customer_id + 1, add_timestamp)
+        return self._insert_new_rows('customers', customers_df, add_timestamp)
+    
+    def _new_products_df(self, start_id, add_timestamp):
+        """Build a batch of new products with ids from start_id"""
         new_products = []
         
-        for i in range(NEW_RECORDS_BATCH_SIZE // 2):  # Fewer new products than customers
-            product_id = max_product_id + i + 1
+        for i in range(NEW_PRODUCTS_BATCH_SIZE):
+            product_id = start_id + i
             category = random.choice(list(PRODUCT_CATEGORIES.keys()))
             subcategory = random.choice(PRODUCT_CATEGORIES[category])
             brand = random.choice(BRANDS)
@@ -278,94 +448,147 @@ class SCD2DataGenerator:
                 'created_at': add_timestamp
             })
         
-        products_df = pd.DataFrame(new_products)
-        self.conn.execute("INSERT INTO products SELECT * FROM products_df")
-        print(f"Added {len(new_products)} new products")
-        
-        return len(new_products)
+        return pd.DataFrame(new_products)
+    
+    def add_new_products(self, add_timestamp=None):
+        """Add new products"""
+        if add_timestamp is None:
+            add_timestamp = datetime.now()
+            
+        max_product_id = self.get_table_max_id('products', 'product_id')
+        products_df = self._new_products_df(max_product_id + 1, add_timestamp)
+        return self._insert_new_rows('products', products_df, add_timestamp)
     
     def update_order_statuses(self, update_timestamp=None):
         """Update order statuses (common business operation)"""
         if update_timestamp is None:
             update_timestamp = datetime.now()
-            
+        
+        # One CASE branch per transitional state: move on with the configured
+        # probability, picking uniformly among the possible next states
+        transitions = '\n'.join(
+            f"WHEN '{status}' THEN CASE WHEN random() < {probability} THEN {_pick(next_statuses)} END"
+            for status, (probability, next_statuses) in ORDER_STATUS_TRANSITIONS.items()
+        )
+        
         # Update orders that are in transitional states
-        orders_to_update = self.conn.execute("""
-            SELECT order_id, status 
-            FROM orders 
-            WHERE status IN ('pending', 'confirmed', 'shipped')
-            ORDER BY RANDOM()
-            LIMIT ?
-        """, [UPDATE_BATCH_SIZE // 2]).fetchall()
-        
-        updates = []
-        for order_id, current_status in orders_to_update:
-            # Define status transitions
-            if current_status == 'pending' and random.random() < 0.7:
-                new_status = random.choice(['confirmed', 'cancelled'])
-            elif current_status == 'confirmed' and random.random() < 0.8:
-                new_status = 'shipped'
-            elif current_status == 'shipped' and random.random() < 0.9:
-                new_status = 'delivered'
-            else:
-                continue
-                
-            updates.append({
-                'order_id': order_id,
-                'status': new_status,
-                'updated_at': update_timestamp
-            })
+        self._execute_stage('sample_order_updates', f"""
+            CREATE OR REPLACE TEMP TABLE order_updates AS
+            WITH transitional AS (
+                SELECT order_id, status
+                FROM orders
+                WHERE status IN ({', '.join(f"'{status}'" for status in ORDER_STATUS_TRANSITIONS)})
+                    -- Historical batches must not update orders placed after them
+                    AND created_at <= ?::TIMESTAMP
+            ),
+            sampled AS (
+                -- Sampling applies before WHERE, so filter first and sample the result
+                SELECT
+                    order_id,
+                    CASE status {transitions} END AS status
+                FROM transitional
+                USING SAMPLE reservoir({int(UPDATE_BATCH_SIZE // 2)} ROWS)
+            )
+            SELECT order_id, status, ?::TIMESTAMP AS updated_at
+            FROM sampled
+            WHERE status IS NOT NULL
+        """, [update_timestamp, update_timestamp])
         
-        if updates:
-            updates_df = pd.DataFrame(updates)
-            self.conn.execute("DROP TABLE IF EXISTS temp_order_updates")
-            self.conn.execute("CREATE TABLE temp_order_updates AS SELECT * FROM updates_df")
-            
-            self.conn.execute("""
-                UPDATE orders 
-                SET status = temp.status,
-                    updated_at = temp.updated_at
-                FROM temp_order_updates temp
-                WHERE orders.order_id = temp.order_id
-            """)
-            self.conn.execute("DROP TABLE temp_order_updates")
-            
-            print(f"Updated {len(updates)} order statuses")
+        self._capture_before('orders', 'order_updates')
+        self._execute_stage('update_orders', """
+            UPDATE orders 
+            SET status = temp.status,
+                updated_at = temp.updated_at
+            FROM order_updates temp
+            WHERE orders.order_id = temp.order_id
+        """)
+        self._log_updates('orders', update_timestamp)
+        num_updates = self._drop_temp_table('order_updates')
+        
+        if num_updates:
+            print(f"Updated {num_updates} order statuses")
         
-        return len(updates)
+        return num_updates
     
-    def generate_incremental_batch(self, batch_timestamp=None):
-        """Generate a complete batch of incremental updates"""
-        if batch_timestamp is None:
-            batch_timestamp = datetime.now()
-            
+    def _plan_batch(self, batch_timestamp, customer_start_id, product_start_id):
+        """Build the new rows of a batch; needs no database access, so it can run ahead"""
+        return {
+            'timestamp': batch_timestamp,
+            'customers': self.stats.timed(
+                'new_customers_df', lambda: self._new_customers_df(customer_start_id, batch_timestamp)),
+            'products': self.stats.timed(
+                'new_products_df', lambda: self._new_products_df(product_start_id, batch_timestamp))
+        }
+    
+    def _apply_batch(self, plan):
+        """Apply a planned batch as a single transaction"""
+        batch_timestamp = plan['timestamp']
         print(f"\n=== Generating incremental batch for {batch_timestamp} ===")
         
         total_changes = 0
         
-        # Update existing data
-        total_changes += self.update_customer_data(batch_timestamp)
-        total_changes += self.update_product_data(batch_timestamp)
-        total_changes += self.update_order_statuses(batch_timestamp)
-        
-        # Add new data
-        total_changes += self.add_new_customers(batch_timestamp)
-        total_changes += self.add_new_products(batch_timestamp)
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            # Update existing data
+            total_changes += self.update_customer_data(batch_timestamp)
+            total_changes += self.update_product_data(batch_timestamp)
+            total_changes += self.update_order_statuses(batch_timestamp)
+            
+            # Add new data
+            total_changes += self._insert_new_rows('customers', plan['customers'], batch_timestamp)
+            total_changes += self._insert_new_rows('products', plan['products'], batch_timestamp)
+            with self.stats.stage('commit'):
+                self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
         
         print(f"Total changes in this batch: {total_changes}")
         return total_changes
     
+    def generate_incremental_batch(self, batch_timestamp=None):
+        """Generate a complete batch of incremental updates"""
+        if batch_timestamp is None:
+            batch_timestamp = datetime.now()
+        
+        plan = self._plan_batch(
+            batch_timestamp,
+            self.get_table_max_id('customers', 'customer_id') + 1,
+            self.get_table_max_id('products', 'product_id') + 1
+        )
+        return self._apply_batch(plan)
+    
     def generate_historical_batches(self, num_batches=5, days_between_batches=7):
         """Generate multiple historical batches for testing"""
         print(f"Generating {num_batches} historical batches...")
+        start = time.perf_counter()
         
         base_date = datetime.now() - timedelta(days=num_batches * days_between_batches)
         
-        for i in range(num_batches):
-            batch_date = base_date + timedelta(days=i * days_between_batches)
-            self.generate_incremental_batch(batch_date)
+        # Id ranges for every batch come from one max-id read up front
+        customer_start_id = self.get_table_max_id('customers', 'customer_id') + 1
+        product_start_id = self.get_table_max_id('products', 'product_id') + 1
+        
+        # A single planner thread builds the new rows of later batches while
+        # earlier ones are applied; DuckDB releases the GIL while it executes
+        total_changes = 0
+        with ThreadPoolExecutor(max_workers=1) as planner:
+            plans = [
+                planner.submit(
+                    self._plan_batch,
+                    base_date + timedelta(days=i * days_between_batches),
+                    customer_start_id + i * NEW_RECORDS_BATCH_SIZE,
+                    product_start_id + i * NEW_PRODUCTS_BATCH_SIZE
+                )
+                for i in range(num_batches)
+            ]
+            for plan in plans:
+                total_changes += self._apply_batch(plan.result())
             
-        print(f"\nCompleted generating {num_batches} historical batches")
+        elapsed = time.perf_counter() - start
+        print(f"\nCompleted generating {num_batches} historical batches "
+              f"({total_changes} changes) in {elapsed:.2f}s")
+        return total_changes
     
     def get_summary_stats(self):
         """Print summary statistics"""
@@ -384,8 +607,25 @@ class SCD2DataGenerator:
         """).fetchone()[0]
         print(f"Customers with updates: {recent_customers:,}")
         
+        if self.log_changes:
+            print("\n=== Change Log ===")
+            for entity, operation, count in self.conn.execute("""
+                SELECT entity, operation, COUNT(*) FROM change_log
+                GROUP BY ALL ORDER BY ALL
+            """).fetchall():
+                print(f"{entity} {operation}s: {count:,}")
+        
+    def print_stage_stats(self):
+        """Print the stage timings recorded so far"""
+        print(f"\n=== Stage Timings (run {self.stats.run_id}) ===")
+        self.stats.print_summary()
+    
     def close(self):
-        """Close database connection"""
+        """Write the recorded stage timings and close the database connection"""
+        if self.stats_table:
+            self.stats.write_table(self.conn, self.stats_table)
+        if self.stats_jsonl:
+            self.stats.write_jsonl(self.stats_jsonl)
         self.conn.close()
 
 def main():
@@ -401,21 +641,34 @@ def main():
     # Generate a single incremental batch
     print("\nOption 1: Generate single incremental batch")
     print("Option 2: Generate multiple historical batches")
-    print("Option 3: Exit")
+    print("Option 3: Export change log to Parquet")
+    print("Option 4: Replay a Parquet change log into this database")
+    print("Option 5: Exit")
     
-    choice = input("\nEnter your choice (1-3): ").strip()
+    choice = input("\nEnter your choice (1-5): ").strip()
     
     if choice == '1':
         generator.generate_incremental_batch()
         generator.get_summary_stats()
+        generator.print_stage_stats()
         
     elif choice == '2':
         num_batches = int(input("Enter number of batches to generate (default 5): ") or "5")
         days_between = int(input("Enter days between batches (default 7): ") or "7")
         generator.generate_historical_batches(num_batches, days_between)
         generator.get_summary_stats()
+        generator.print_stage_stats()
         
     elif choice == '3':
+        output_dir = input("Enter output directory (default changes): ").strip() or "changes"
+        generator.export_change_log(output_dir)
+        
+    elif choice == '4':
+        input_dir = input("Enter change log directory (default changes): ").strip() or "changes"
+        replay_change_log(generator.conn, f"read_parquet('{input_dir}/**/*.parquet', hive_partitioning = true)")
+        generator.get_summary_stats()
+        
+    elif choice == '5':
         print("Exiting...")
     else:
         print("Invalid choice")
@@ -0,0 +1,143 @@
+import argparse
+import json
+import math
+import os
+import tempfile
+from datetime import datetime
+
+import duckdb
+
+import generate_data as gd
+from stage_stats import StageStats, reset_peak_rss
+
+DEFAULT_SCALE_FACTORS = [1, 10, 100]
+
+# Both engines draw from the same distributions, so the share of the busiest
+# products and customers must match between them up to sampling noise. A
+# difference fails the parity check when it exceeds the relative tolerance
+# and also PARITY_STANDARD_ERRORS binomial standard errors, so the noisy top
+# shares of uniform data do not fail it
+SHARE_TOP_K = [1, 10, 100]
+DEFAULT_PARITY_TOLERANCE = 0.1
+PARITY_STANDARD_ERRORS = 4
+
+def top_k_shares(conn):
+    """(share, rows) of all order items held by the top-k products and of all orders by the top-k customers"""
+    shares = {}
+    for name, table, column in [('products', 'order_items', 'product_id'), ('customers', 'orders', 'customer_id')]:
+        counts = conn.execute(
+            f"SELECT COUNT(*) AS n FROM {table} GROUP BY {column} ORDER BY n DESC"
+        ).fetchnumpy()['n'].cumsum()
+        for k in SHARE_TOP_K:
+            shares[f'top_{k}_{name}'] = (float(counts[min(k, len(counts)) - 1] / counts[-1]), int(counts[-1]))
+    return shares
+
+def run_benchmark(engine, scale_factor, seed=gd.DEFAULT_SEED, chunk_size=gd.DEFAULT_CHUNK_SIZE, now=None,
+                  customer_skew=0.0, product_skew=0.0):
+    """Generate one scale factor into a scratch database.
+
+    Returns the per-stage results and the top-k shares of the data. The
+    stages are those the generators record themselves: each generator
+    function, the Arrow batch build, each DuckDB insert and each SQL INSERT.
+    """
+    now = now or gd._now()
+    counts = gd.row_counts(scale_factor)
+    stats = StageStats('benchmark_generate')
+    with tempfile.TemporaryDirectory() as scratch:
+        conn = duckdb.connect(os.path.join(scratch, 'benchmark.duckdb'))
+        gd.create_tables(conn)
+        if engine == 'sql':
+            gd.populate_tables_sql(conn, seed, now, counts['customers'], counts['products'], counts['orders'],
+                                   customer_skew=customer_skew, product_skew=product_skew, stats=stats)
+        else:
+            gd.populate_tables_numpy(conn, seed, now, counts['customers'], counts['products'], counts['orders'],
+                                     chunk_size=chunk_size, spill_root=scratch, customer_skew=customer_skew,
+                                     product_skew=product_skew, stats=stats)
+        shares = top_k_shares(conn)
+        conn.close()
+
+    return shares, [
+        {
+            'engine': engine,
+            'scale_factor': scale_factor,
+            'stage': stage,
+            'rows': stat['rows'],
+            'wall_s': round(stat['wall_s'], 3),
+            'rows_per_s': round(stat['rows'] / stat['wall_s']) if stat['wall_s'] else None,
+            'peak_rss_mb': round(stat['peak_rss_mb'], 1)
+        }
+        for stage, stat in stats.summary().items()
+    ]
+
+def parity_failures(shares, tolerance=DEFAULT_PARITY_TOLERANCE):
+    """Print the top-k shares of both engines per scale factor; returns the ones that differ too much"""
+    failures = []
+    print(f"\n{'SF':>6} {'share':<18} {'numpy':>8} {'sql':>8} {'diff':>7}")
+    for scale_factor in sorted({sf for _, sf in shares}):
+        numpy_shares, sql_shares = shares[('numpy', scale_factor)], shares[('sql', scale_factor)]
+        for name, (numpy_share, rows) in numpy_shares.items():
+            sql_share = sql_shares[name][0]
+            diff = abs(sql_share - numpy_share)
+            standard_error = math.sqrt(2 * numpy_share * (1 - numpy_share) / rows)
+            print(f"{scale_factor:>6g} {name:<18} {numpy_share:>8.2%} {sql_share:>8.2%} {diff / numpy_share:>7.1%}")
+            if diff > tolerance * numpy_share and diff > PARITY_STANDARD_ERRORS * standard_error:
+                failures.append((scale_factor, name))
+    return failures
+
+def print_results(results):
+    header = f"{'engine':<7} {'SF':>6} {'stage':<18} {'rows':>14} {'wall s':>9} {'rows/s':>12} {'peak MB':>9}"
+    print(header)
+    print('-' * len(header))
+    for r in results:
+        rows_per_s = f"{r['rows_per_s']:,}" if r['rows_per_s'] is not None else '-'
+        print(f"{r['engine']:<7} {r['scale_factor']:>6g} {r['stage']:<18} {r['rows']:>14,} "
+              f"{r['wall_s']:>9.3f} {rows_per_s:>12} {r['peak_rss_mb']:>9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generate_data.py stages at several scale factors")
+    parser.add_argument('--scale-factors', type=lambda s: [float(x) for x in s.split(',')],
+                        default=DEFAULT_SCALE_FACTORS, help="Comma separated, e.g. 1,10,100")
+    parser.add_argument('--engines', type=lambda s: s.split(','), default=['numpy', 'sql'])
+    parser.add_argument('--seed', type=int, default=gd.DEFAULT_SEED)
+    parser.add_argument('--chunk-size', type=int, default=gd.DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--customer-skew', type=float, default=0.0, help="See generate_data.py --customer-skew")
+    parser.add_argument('--product-skew', type=float, default=0.0, help="See generate_data.py --product-skew")
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    parser.add_argument('--check-parity', action='store_true',
+                        help="Fail unless both engines give the same top-k product and customer shares")
+    parser.add_argument('--parity-tolerance', type=float, default=DEFAULT_PARITY_TOLERANCE,
+                        help="Largest relative difference of a top-k share between the engines")
+    args = parser.parse_args()
+    if args.check_parity and sorted(args.engines) != ['numpy', 'sql']:
+        parser.error("--check-parity needs --engines numpy,sql")
+
+    if not reset_peak_rss():
+        print("Peak RSS cannot be reset on this platform; peak MB is the process lifetime peak")
+
+    now = gd._now()
+    results = []
+    shares = {}
+    for engine in args.engines:
+        for scale_factor in args.scale_factors:
+            print(f"Benchmarking {engine} engine at scale factor {scale_factor:g}...")
+            shares[(engine, scale_factor)], stage_results = run_benchmark(
+                engine, scale_factor, args.seed, args.chunk_size, now, args.customer_skew, args.product_skew)
+            results.extend(stage_results)
+
+    print()
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'run_at': datetime.now().isoformat(timespec='seconds'), 'results': results}, f, indent=2)
+        print(f"\nResults written to '{args.json}'")
+
+    if args.check_parity:
+        failures = parity_failures(shares, args.parity_tolerance)
+        if failures:
+            raise SystemExit(f"Engines differ by more than {args.parity_tolerance:.0%} in: "
+                             + ', '.join(f"{name} at SF {sf:g}" for sf, name in failures))
+        print("Engine parity OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Content-addressed cache of generated datasets.
+
+Each entry is a directory named by the hash of everything that determines the
+generated data: seed, row counts, as-of timestamp, skews, engine and the
+generator's own source (its distribution constants, DDL and ENUM types). It
+holds the finished database and any exports made from it. Restoring an entry
+is a file copy, or a copy-on-write reflink where the filesystem supports it.
+The least recently used entries are evicted once the cache outgrows its size
+limit.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+DEFAULT_CACHE_DIR = os.environ.get('NEPAL_ECOMMERCE_CACHE_DIR',
+                                   os.path.join(os.path.expanduser('~'), '.cache', 'nepal_ecommerce'))
+DEFAULT_MAX_GB = 20
+
+DB_FILE = 'database.duckdb'
+META_FILE = 'meta.json'
+
+# ioctl that clones a file's extents (btrfs, XFS, overlayfs on either)
+FICLONE = 0x40049409
+
+def cache_key(params):
+    """Hex digest of a JSON-serialisable dict of generation parameters"""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:32]
+
+def source_fingerprint(path):
+    """Hash of a source file, so any change to a generator invalidates its entries"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def clone_file(src, dst):
+    """Copy a file, as a reflink where the filesystem supports it"""
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            return dst
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+    return dst
+
+def _tree_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+class DatasetCache:
+    """Stores and restores generated databases and their exports by key.
+
+    An export is kept as a directory per format: `csv` holds <table>.csv and
+    `parquet` mirrors the output_dir/<table>/ layout. Entries are written to a
+    temporary directory and renamed into place, so concurrent jobs never see a
+    partial entry.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_gb=DEFAULT_MAX_GB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_gb * 2**30)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def contains(self, key):
+        return os.path.exists(os.path.join(self._entry(key), META_FILE))
+
+    def has_export(self, key, export):
+        return os.path.isdir(os.path.join(self._entry(key), export))
+
+    def restore(self, key, db_path):
+        """Copy the cached database to db_path, replacing any database there"""
+        entry = self._entry(key)
+        for path in [db_path, db_path + '.wal']:
+            if os.path.exists(path):
+                os.remove(path)
+        clone_file(os.path.join(entry, DB_FILE), db_path)
+        # The entry's mtime is its last use for LRU eviction
+        os.utime(entry)
+
+    def restore_export(self, key, export, output_dir='parquet'):
+        """Copy a cached export to where export_csv/export_parquet write it"""
+        source = os.path.join(self._entry(key), export)
+        if export == 'csv':
+            for name in os.listdir(source):
+                clone_file(os.path.join(source, name), name)
+        else:
+            for table in os.listdir(source):
+                shutil.rmtree(os.path.join(output_dir, table), ignore_errors=True)
+            shutil.copytree(source, output_dir, copy_function=clone_file, dirs_exist_ok=True)
+
+    def store(self, key, params, db_path, tables, export='none', output_dir='parquet'):
+        """Add a closed database and its export (if any) as a new entry"""
+        entry = self._entry(key)
+        if os.path.exists(entry):
+            return
+        staging = os.path.join(self.cache_dir, f'.tmp-{uuid.uuid4().hex}')
+        os.makedirs(staging)
+        try:
+            clone_file(db_path, os.path.join(staging, DB_FILE))
+            self._copy_export(staging, tables, export, output_dir)
+            with open(os.path.join(staging, META_FILE), 'w') as f:
+                json.dump({'params': params, 'created_at': time.time()}, f, indent=2, default=str)
+            os.rename(staging, entry)
+        except OSError:
+            # Another job stored the same key first
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.exists(entry):
+                raise
+        self.evict(keep=key)
+
+    def store_export(self, key, tables, export, output_dir='parquet'):
+        """Add an export made from a restored database to its entry"""
+        entry = self._entry(key)
+        staging = os.path.join(entry, f'.tmp-{uuid.uuid4().hex}')
+        os.makedirs(staging)
+        self._copy_export(staging, tables, export, output_dir)
+        try:
+            os.rename(os.path.join(staging, export), os.path.join(entry, export))
+        except OSError:
+            pass
+        shutil.rmtree(staging, ignore_errors=True)
+        self.evict(keep=key)
+
+    def _copy_export(self, target, tables, export, output_dir):
+        if export == 'csv':
+            os.makedirs(os.path.join(target, 'csv'))
+            for table in tables:
+                clone_file(f'{table}.csv', os.path.join(target, 'csv', f'{table}.csv'))
+        elif export == 'parquet':
+            for table in tables:
+                shutil.copytree(os.path.join(output_dir, table), os.path.join(target, 'parquet', table),
+                                copy_function=clone_file)
+
+    def entries(self):
+        """(key, bytes, last used) of every entry, least recently used first"""
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            path = self._entry(key)
+            if key.startswith('.') or not os.path.isdir(path):
+                continue
+            entries.append((key, _tree_size(path), os.path.getmtime(path)))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache fits max_bytes; never removes `keep`"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            total -= size
+            print(f"Evicted dataset cache entry {key} ({size / 2**20:,.1f} MB)")
@@ -0,0 +1,131 @@
+"""Customer locations and nearest dropoff location lookup.
+
+Coordinates are projected to kilometres around the dropoff locations' mean
+latitude (equirectangular, accurate to well under a percent across Nepal) and
+distances are Euclidean in that plane. fct_dropoff_summary uses the same
+projection, so it finds the same nearest location as the generator.
+
+DropoffIndex is a uniform grid over the dropoff locations. Every cell keeps
+the locations that can be nearest to some point inside it: those whose
+distance to the cell is at most the smallest distance to the cell's far
+corner over all locations. A lookup is then one cell computation and a
+distance to a handful of candidates per point, fully vectorised, instead of
+a distance to every location.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_DROPOFF_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'seeds', 'dropoff_locations.csv')
+
+KM_PER_DEGREE_LAT = 110.574
+KM_PER_DEGREE_LON = 111.320  # at the equator; times cos(latitude) elsewhere
+
+# Standard deviation of a customer's offset from the dropoff location it is
+# generated around, per axis
+CUSTOMER_SPREAD_KM = 3.0
+
+COORDINATE_DECIMALS = 6  # DECIMAL(9,6) in the customers table and the seed
+
+def load_dropoff_locations(path=DEFAULT_DROPOFF_CSV):
+    """Dropoff locations (id, name, latitude, longitude) rounded like the dbt seed"""
+    dropoffs = pd.read_csv(path).sort_values('id', ignore_index=True)
+    dropoffs[['latitude', 'longitude']] = dropoffs[['latitude', 'longitude']].round(COORDINATE_DECIMALS)
+    return dropoffs
+
+def km_per_degree_lon(dropoffs):
+    """Kilometres per degree of longitude at the dropoff locations' mean latitude"""
+    return KM_PER_DEGREE_LON * np.cos(np.radians(dropoffs['latitude'].mean()))
+
+def customer_locations(rng, n, dropoffs, spread_km=CUSTOMER_SPREAD_KM):
+    """Latitudes and longitudes scattered normally around randomly chosen dropoff locations"""
+    anchor = rng.integers(0, len(dropoffs), size=n)
+    offset = rng.normal(0.0, spread_km, size=(2, n))
+    latitude = dropoffs['latitude'].to_numpy()[anchor] + offset[0] / KM_PER_DEGREE_LAT
+    longitude = dropoffs['longitude'].to_numpy()[anchor] + offset[1] / km_per_degree_lon(dropoffs)
+    return np.round(latitude, COORDINATE_DECIMALS), np.round(longitude, COORDINATE_DECIMALS)
+
+class DropoffIndex:
+    """Nearest dropoff location for many points at once.
+
+    The grid has about one cell per location over the locations' bounding
+    box plus one cell on each side; the few points outside it are compared
+    with every location.
+    """
+
+    def __init__(self, dropoffs, chunk_size=1_000_000):
+        self.ids = dropoffs['id'].to_numpy()
+        self.km_per_lon = km_per_degree_lon(dropoffs)
+        self.chunk_size = chunk_size
+        x, y = self.project(dropoffs['latitude'].to_numpy(), dropoffs['longitude'].to_numpy())
+        # A sentinel location at infinity pads the candidate lists
+        self.x = np.append(x, np.inf)
+        self.y = np.append(y, np.inf)
+
+        m = len(x)
+        width, height = np.ptp(x), np.ptp(y)
+        self.cell_km = max(np.sqrt(width * height / m), max(width, height) / m, 1e-3)
+        self.x0 = x.min() - self.cell_km
+        self.y0 = y.min() - self.cell_km
+        self.nx = int(width // self.cell_km) + 3
+        self.ny = int(height // self.cell_km) + 3
+        self.candidates = self._build_candidates(x, y)
+
+    def project(self, latitude, longitude):
+        """Kilometre coordinates as used by fct_dropoff_summary"""
+        return np.asarray(longitude, dtype=float) * self.km_per_lon, np.asarray(latitude, dtype=float) * KM_PER_DEGREE_LAT
+
+    def _build_candidates(self, x, y, cells_per_chunk=256):
+        """Candidate location indexes per cell, padded with the sentinel"""
+        cell_x, cell_y = np.divmod(np.arange(self.nx * self.ny), self.ny)
+        counts, columns = [], []
+        for start in range(0, len(cell_x), cells_per_chunk):
+            x_lo = self.x0 + cell_x[start:start + cells_per_chunk, None] * self.cell_km
+            y_lo = self.y0 + cell_y[start:start + cells_per_chunk, None] * self.cell_km
+            x_hi, y_hi = x_lo + self.cell_km, y_lo + self.cell_km
+            near = (np.maximum(np.maximum(x_lo - x, x - x_hi), 0) ** 2
+                    + np.maximum(np.maximum(y_lo - y, y - y_hi), 0) ** 2)
+            far = np.maximum(np.abs(x - x_lo), np.abs(x - x_hi)) ** 2 + np.maximum(np.abs(y - y_lo), np.abs(y - y_hi)) ** 2
+            is_candidate = near <= far.min(axis=1, keepdims=True)
+            counts.append(is_candidate.sum(axis=1))
+            columns.append(np.nonzero(is_candidate)[1])
+        counts, columns = np.concatenate(counts), np.concatenate(columns)
+        candidates = np.full((len(counts), counts.max()), len(x), dtype=np.int32)
+        slots = np.arange(len(columns)) - np.repeat(np.cumsum(counts) - counts, counts)
+        candidates[np.repeat(np.arange(len(counts)), counts), slots] = columns
+        return candidates
+
+    def _nearest_projected(self, x, y):
+        ix = np.floor((x - self.x0) / self.cell_km)
+        iy = np.floor((y - self.y0) / self.cell_km)
+        inside = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+        best = np.empty(len(x), dtype=np.int64)
+        distance = np.empty(len(x))
+
+        cand = self.candidates[(ix[inside] * self.ny + iy[inside]).astype(np.int64)]
+        d2 = (x[inside, None] - self.x[cand]) ** 2 + (y[inside, None] - self.y[cand]) ** 2
+        pick = d2.argmin(axis=1)
+        best[inside] = cand[np.arange(len(cand)), pick]
+        distance[inside] = np.sqrt(d2[np.arange(len(cand)), pick])
+
+        # Points outside the grid are compared with every location, in blocks
+        # of about ten million distances
+        outside = np.flatnonzero(~inside)
+        block = max(10_000_000 // (len(self.x) - 1), 1)
+        for start in range(0, len(outside), block):
+            rows = outside[start:start + block]
+            d2 = (x[rows, None] - self.x[None, :-1]) ** 2 + (y[rows, None] - self.y[None, :-1]) ** 2
+            best[rows] = d2.argmin(axis=1)
+            distance[rows] = np.sqrt(d2.min(axis=1))
+        return best, distance
+
+    def nearest(self, latitude, longitude):
+        """(dropoff location ids, distances in km) of the nearest location to each point"""
+        x, y = self.project(latitude, longitude)
+        best = np.empty(len(x), dtype=np.int64)
+        distance = np.empty(len(x))
+        for start in range(0, len(x), self.chunk_size):
+            chunk = slice(start, start + self.chunk_size)
+            best[chunk], distance[chunk] = self._nearest_projected(x[chunk], y[chunk])
+        return self.ids[best], distance
@@ -1,12 +1,23 @@
+import argparse
+import inspect
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
 import duckdb
+import numpy as np
 import pandas as pd
-from faker import Faker
-import random
+import pyarrow as pa
 from datetime import datetime, timedelta
-import uuid
 
-# Initialize Faker
-fake = Faker()
+from dataset_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_GB, DatasetCache, cache_key, source_fingerprint
+from dropoff_index import (CUSTOMER_SPREAD_KM, DEFAULT_DROPOFF_CSV, KM_PER_DEGREE_LAT, DropoffIndex,
+                           customer_locations, km_per_degree_lon, load_dropoff_locations)
+from stage_stats import DEFAULT_STATS_TABLE, StageStats
 
 # Nepal-specific data
 NEPAL_FIRST_NAMES = [
@@ -50,216 +61,314 @@ BRANDS = [
     'Dabur', 'Himalaya', 'Unilever', 'P&G', 'Goldstar', 'CG', 'Bajaj'
 ]
 
-def generate_customers(n=12000):
-    """Generate customer data"""
-    customers = []
-    
-    for i in range(1, n + 1):
-        first_name = random.choice(NEPAL_FIRST_NAMES)
-        last_name = random.choice(NEPAL_LAST_NAMES)
-        
-        # Generate realistic email
-        email_domain = random.choice(['gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'email.com'])
-        email = f"{first_name.lower()}.{last_name.lower()}{random.randint(1, 999)}@{email_domain}"
-        
-        # Nepal phone format
-        phone = f"+977-{random.randint(980, 989)}-{random.randint(1000000, 9999999)}"
-        
-        # Generate realistic birth date (18-70 years old)
-        birth_date = fake.date_of_birth(minimum_age=18, maximum_age=70)
-        
-        created_at = fake.date_time_between(start_date='-2y', end_date='now')
-        
-        customers.append({
-            'customer_id': i,
-            'first_name': first_name,
-            'last_name': last_name,
-            'email': email,
-            'phone': phone,
-            'date_of_birth': birth_date,
-            'gender': random.choice(['Male', 'Female']),
-            'created_at': created_at,
-            'updated_at': created_at + timedelta(days=random.randint(0, 30))
-        })
-    
-    return customers
+# Generate realistic Nepal pricing (in NPR), inclusive bounds per category
+CATEGORY_PRICE_RANGES = {
+    'Electronics': (5000, 150000),
+    'Fashion': (500, 15000),
+    'Home & Kitchen': (1000, 25000),
+    'Books': (200, 2000),
+    'Health & Beauty': (300, 3000),
+    'Sports': (800, 12000),
+    'Groceries': (50, 1500)
+}
+
+EMAIL_DOMAINS = ['gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'email.com']
+GENDERS = ['Male', 'Female']
+
+SHIPPING_COSTS = [0, 100, 150, 200]  # Free shipping or standard rates
+DIGITAL_PAYMENT_METHODS = ['eSewa', 'Khalti', 'IME Pay', 'Credit Card', 'Debit Card']
+
+# Random number of items per order (1-4, weighted toward 1-2)
+ITEMS_PER_ORDER = [1, 2, 3, 4]
+ITEMS_PER_ORDER_WEIGHTS = [0.4, 0.35, 0.2, 0.05]
+
+ITEM_QUANTITIES = [1, 2, 3]
+ITEM_QUANTITY_WEIGHTS = [0.7, 0.25, 0.05]
+
+
+def _weighted_choice(rng, values, weights, n):
+    """Draw n values with the given weights as a numpy array"""
+    weights = np.asarray(weights, dtype=float)
+    return np.asarray(values)[rng.choice(len(values), size=n, p=weights / weights.sum())]
+
+def _random_timestamps(rng, n, start, end):
+    """Draw n second-resolution timestamps uniformly between start and end"""
+    start = np.datetime64(start, 's')
+    span = int((np.datetime64(end, 's') - start) / np.timedelta64(1, 's'))
+    return start + rng.integers(0, span + 1, size=n).astype('timedelta64[s]')
+
+def _scatter_multiplier(domain, skew):
+    """Stride that maps popularity ranks onto ids: coprime with domain so it is a permutation,
+    near the golden ratio of domain so popular ids spread over the whole id range"""
+    if skew == 0 or domain <= 2:
+        return 1
+    multiplier = int(domain * 0.6180339887) | 1
+    while math.gcd(multiplier, domain) != 1:
+        multiplier += 2
+    return multiplier
+
+def _power_law_ranks(u, domain, skew):
+    """Map uniform draws u to ranks 1..domain with P(rank k) roughly proportional to k^-skew.
+
+    Inverse CDF of a power law bounded to [1, domain + 1), so it costs a few
+    vector operations and no table of domain weights at any scale.
+    """
+    if skew == 1:
+        ranks = np.exp(u * np.log(domain + 1))
+    else:
+        ranks = ((float(domain + 1) ** (1 - skew) - 1) * u + 1) ** (1 / (1 - skew))
+    return np.minimum(ranks.astype(np.int64), domain)
+
+def _skewed_ids(rng, n, domain, skew):
+    """Draw n ids in 1..domain, uniformly for skew 0 and Zipf-like by popularity rank otherwise"""
+    if skew == 0:
+        return rng.integers(1, domain + 1, size=n)
+    ranks = _power_law_ranks(rng.random(size=n), domain, skew)
+    return 1 + (ranks - 1) * _scatter_multiplier(domain, skew) % domain
+
+def _to_str(values):
+    """Format a numpy array as a string Series for vectorized concatenation"""
+    return pd.Series(values).astype(str)
+
+def _years_before(day, years):
+    """Shift a date back by whole years, mapping Feb 29 to Feb 28"""
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+def _now():
+    return datetime.now().replace(microsecond=0)
+
+def generate_customers(n=12000, rng=None, start_id=1, now=None, dropoffs=None):
+    """Generate customer data; customers live around the dropoff locations"""
+    rng = rng if rng is not None else np.random.default_rng()
+    now = now or _now()
+    dropoffs = load_dropoff_locations() if dropoffs is None else dropoffs
+
+    first_names = _to_str(rng.choice(NEPAL_FIRST_NAMES, size=n))
+    last_names = _to_str(rng.choice(NEPAL_LAST_NAMES, size=n))
 
-def generate_products(n=800):
+    # Generate realistic email
+    email = (
+        first_names.str.lower() + '.' + last_names.str.lower()
+        + _to_str(rng.integers(1, 1000, size=n))
+        + '@' + _to_str(rng.choice(EMAIL_DOMAINS, size=n))
+    )
+
+    # Nepal phone format
+    phone = (
+        '+977-' + _to_str(rng.integers(980, 990, size=n))
+        + '-' + _to_str(rng.integers(1000000, 10000000, size=n))
+    )
+
+    # Generate realistic birth date (18-70 years old)
+    oldest = np.datetime64(_years_before(now.date(), 71) + timedelta(days=1), 'D')
+    youngest = np.datetime64(_years_before(now.date(), 18), 'D')
+    date_of_birth = oldest + rng.integers(0, (youngest - oldest).astype(int) + 1, size=n)
+
+    created_at = _random_timestamps(rng, n, now - timedelta(days=2 * 365), now)
+    gender = rng.choice(GENDERS, size=n)
+    updated_at = created_at + rng.integers(0, 31, size=n).astype('timedelta64[D]')
+    latitude, longitude = customer_locations(rng, n, dropoffs)
+
+    return pd.DataFrame({
+        'customer_id': np.arange(start_id, start_id + n, dtype=np.int64),
+        'first_name': first_names,
+        'last_name': last_names,
+        'email': email,
+        'phone': phone,
+        'date_of_birth': date_of_birth,
+        'gender': gender,
+        'latitude': latitude,
+        'longitude': longitude,
+        'created_at': created_at,
+        'updated_at': updated_at
+    })
+
+def generate_products(n=800, rng=None, start_id=1, now=None):
     """Generate product data"""
-    products = []
-    
-    for i in range(1, n + 1):
-        category = random.choice(list(PRODUCT_CATEGORIES.keys()))
-        subcategory = random.choice(PRODUCT_CATEGORIES[category])
-        brand = random.choice(BRANDS)
-        
-        # Generate realistic Nepal pricing (in NPR)
-        if category == 'Electronics':
-            price = random.randint(5000, 150000)
-        elif category == 'Fashion':
-            price = random.randint(500, 15000)
-        elif category == 'Home & Kitchen':
-            price = random.randint(1000, 25000)
-        elif category == 'Books':
-            price = random.randint(200, 2000)
-        elif category == 'Health & Beauty':
-            price = random.randint(300, 3000)
-        elif category == 'Sports':
-            price = random.randint(800, 12000)
-        else:  # Groceries
-            price = random.randint(50, 1500)
-        
-        cost = price * random.uniform(0.4, 0.7)  # 40-70% margin
-        
-        products.append({
-            'product_id': i,
-            'name': f"{brand} {subcategory}",
-            'category': category,
-            'subcategory': subcategory,
-            'brand': brand,
-            'price': round(price, 2),
-            'cost': round(cost, 2),
-            'weight_kg': round(random.uniform(0.1, 5.0), 2),
-            'created_at': fake.date_time_between(start_date='-1y', end_date='now')
-        })
-    
-    return products
+    rng = rng if rng is not None else np.random.default_rng()
+    now = now or _now()
 
-def generate_orders(n=50000, customer_count=12000):
-    """Generate order data"""
-    orders = []
-    
-    for i in range(1, n + 1):
-        customer_id = random.randint(1, customer_count)
-        order_date = fake.date_time_between(start_date='-1y', end_date='now')
-        
-        # Location ID from seed file (1-8)
-        shipping_address_id = random.randint(1, 8)
-        
-        # Weighted status selection
-        status = random.choices(ORDER_STATUSES, weights=ORDER_STATUS_WEIGHTS)[0]
-        
-        # Generate realistic order amounts (NPR)
-        base_amount = random.randint(500, 25000)
-        shipping_cost = random.choice([0, 100, 150, 200])  # Free shipping or standard rates
-        discount_amount = base_amount * random.uniform(0, 0.15) if random.random() < 0.3 else 0
-        
-        total_amount = base_amount + shipping_cost - discount_amount
-        
-        orders.append({
-            'order_id': i,
-            'customer_id': customer_id,
-            'order_date': order_date,
-            'status': status,
-            'total_amount': round(total_amount, 2),
-            'shipping_cost': shipping_cost,
-            'discount_amount': round(discount_amount, 2),
-            'shipping_address_id': shipping_address_id,
-            'created_at': order_date,
-            'updated_at': order_date + timedelta(days=random.randint(0, 7))
-        })
-    
-    return orders
+    categories = list(PRODUCT_CATEGORIES.keys())
+    category_idx = rng.integers(0, len(categories), size=n)
 
-def generate_order_items(orders, product_count=800):
-    """Generate order items data"""
-    order_items = []
-    item_id = 1
-    
-    for order in orders:
-        # Random number of items per order (1-4, weighted toward 1-2)
-        num_items = random.choices([1, 2, 3, 4], weights=[0.4, 0.35, 0.2, 0.05])[0]
-        
-        selected_products = random.sample(range(1, product_count + 1), num_items)
-        
-        for product_id in selected_products:
-            quantity = random.choices([1, 2, 3], weights=[0.7, 0.25, 0.05])[0]
-            
-            # Generate unit price (slight variation from product price)
-            base_price = random.randint(500, 15000)  # Simplified for demo
-            unit_price = base_price * random.uniform(0.9, 1.1)
-            
-            item_discount = unit_price * quantity * random.uniform(0, 0.1) if random.random() < 0.2 else 0
-            total_price = (unit_price * quantity) - item_discount
-            
-            order_items.append({
-                'order_item_id': item_id,
-                'order_id': order['order_id'],
-                'product_id': product_id,
-                'quantity': quantity,
-                'unit_price': round(unit_price, 2),
-                'total_price': round(total_price, 2),
-                'discount_amount': round(item_discount, 2)
-            })
-            
-            item_id += 1
-    
-    return order_items
+    # Subcategory is drawn uniformly within each row's category
+    subcategory = np.empty(n, dtype=object)
+    low = np.empty(n, dtype=np.int64)
+    high = np.empty(n, dtype=np.int64)
+    for idx, category in enumerate(categories):
+        mask = category_idx == idx
+        subcategory[mask] = rng.choice(PRODUCT_CATEGORIES[category], size=int(mask.sum()))
+        low[mask], high[mask] = CATEGORY_PRICE_RANGES[category]
+
+    brand = rng.choice(BRANDS, size=n)
+    price = rng.integers(low, high + 1)
+    cost = price * rng.uniform(0.4, 0.7, size=n)  # 40-70% margin
+
+    return pd.DataFrame({
+        'product_id': np.arange(start_id, start_id + n, dtype=np.int64),
+        'name': _to_str(brand) + ' ' + _to_str(subcategory),
+        'category': np.asarray(categories)[category_idx],
+        'subcategory': subcategory,
+        'brand': brand,
+        'price': price,
+        'cost': np.round(cost, 2),
+        'weight_kg': np.round(rng.uniform(0.1, 5.0, size=n), 2),
+        'created_at': _random_timestamps(rng, n, now - timedelta(days=365), now)
+    })
+
+def generate_orders(n=50000, customer_count=12000, rng=None, start_id=1, now=None, customer_skew=0.0,
+                    customer_dropoffs=None):
+    """Generate order data; customer_skew > 0 gives a few customers most of the orders.
+
+    Orders ship to the customer's nearest dropoff location, looked up in
+    customer_dropoffs at index customer_id - 1; without it they ship to a
+    random one of the 8 seed locations.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    now = now or _now()
+
+    order_date = _random_timestamps(rng, n, now - timedelta(days=365), now)
+
+    # Generate realistic order amounts (NPR)
+    base_amount = rng.integers(500, 25001, size=n)
+    shipping_cost = rng.choice(SHIPPING_COSTS, size=n)
+    has_discount = rng.random(size=n) < 0.3
+    discount_amount = np.where(has_discount, base_amount * rng.uniform(0, 0.15, size=n), 0.0)
+
+    total_amount = base_amount + shipping_cost - discount_amount
+    customer_id = _skewed_ids(rng, n, customer_count, customer_skew)
+    if customer_dropoffs is not None:
+        shipping_address_id = customer_dropoffs[customer_id - 1]
+    else:
+        shipping_address_id = rng.integers(1, 9, size=n)
 
-def generate_payments(orders):
+    return pd.DataFrame({
+        'order_id': np.arange(start_id, start_id + n, dtype=np.int64),
+        'customer_id': customer_id,
+        'order_date': order_date,
+        'status': _weighted_choice(rng, ORDER_STATUSES, ORDER_STATUS_WEIGHTS, n),
+        'total_amount': np.round(total_amount, 2),
+        'shipping_cost': shipping_cost,
+        'discount_amount': np.round(discount_amount, 2),
+        'shipping_address_id': shipping_address_id,
+        'created_at': order_date,
+        'updated_at': order_date + rng.integers(0, 8, size=n).astype('timedelta64[D]')
+    })
+
+def _sample_distinct_products(rng, order_idx, product_count, product_skew=0.0):
+    """Draw product ids so that no order contains the same product twice"""
+    product_id = _skewed_ids(rng, len(order_idx), product_count, product_skew)
+    rows = np.arange(len(order_idx))
+    while True:
+        # Rows are grouped by order, so duplicates sit next to each other once sorted
+        ordering = rows[np.lexsort((product_id[rows], order_idx[rows]))]
+        sorted_orders = order_idx[ordering]
+        sorted_products = product_id[ordering]
+        duplicate = (sorted_orders[1:] == sorted_orders[:-1]) & (sorted_products[1:] == sorted_products[:-1])
+        if not duplicate.any():
+            return product_id
+        redraw = ordering[1:][duplicate]
+        product_id[redraw] = _skewed_ids(rng, len(redraw), product_count, product_skew)
+        # Only orders that just had a product redrawn can still hold a duplicate;
+        # skew makes repeats common, so later passes sort just those rows
+        rows = rows[np.isin(order_idx[rows], order_idx[redraw])]
+
+def _items_per_order(rng, n, product_count):
+    """Draw the number of items in each of n orders"""
+    num_items = _weighted_choice(rng, ITEMS_PER_ORDER, ITEMS_PER_ORDER_WEIGHTS, n)
+    return np.minimum(num_items, product_count)
+
+def generate_order_items(orders, product_prices, rng=None, start_id=1, num_items=None, product_skew=0.0):
+    """Generate order items data.
+
+    product_prices holds the price of product id i at index i - 1; unit
+    prices vary slightly around it. product_skew > 0 makes a few products
+    account for most of the items.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    product_prices = np.asarray(product_prices)
+    product_count = len(product_prices)
+
+    if num_items is None:
+        num_items = _items_per_order(rng, len(orders), product_count)
+
+    # Explode orders into one row per item
+    order_idx = np.repeat(np.arange(len(orders)), num_items)
+    n = len(order_idx)
+
+    quantity = _weighted_choice(rng, ITEM_QUANTITIES, ITEM_QUANTITY_WEIGHTS, n)
+    product_id = _sample_distinct_products(rng, order_idx, product_count, product_skew)
+
+    # Unit price is the product's price with a slight variation
+    unit_price = product_prices[product_id - 1] * rng.uniform(0.9, 1.1, size=n)
+
+    has_discount = rng.random(size=n) < 0.2
+    item_discount = np.where(has_discount, unit_price * quantity * rng.uniform(0, 0.1, size=n), 0.0)
+    total_price = (unit_price * quantity) - item_discount
+
+    return pd.DataFrame({
+        'order_item_id': np.arange(start_id, start_id + n, dtype=np.int64),
+        'order_id': orders['order_id'].to_numpy()[order_idx],
+        'product_id': product_id,
+        'quantity': quantity,
+        'unit_price': np.round(unit_price, 2),
+        'total_price': np.round(total_price, 2),
+        'discount_amount': np.round(item_discount, 2)
+    })
+
+def generate_payments(orders, rng=None):
     """Generate payment data"""
-    payments = []
-    
-    for order in orders:
-        payment_method = random.choices(PAYMENT_METHODS, weights=PAYMENT_WEIGHTS)[0]
-        payment_status = random.choices(PAYMENT_STATUSES, weights=PAYMENT_STATUS_WEIGHTS)[0]
-        
-        # Payment date usually same as order date or shortly after
-        payment_date = order['order_date'] + timedelta(
-            minutes=random.randint(0, 1440)  # Within 24 hours
-        )
-        
-        # Transaction ID for digital payments
-        transaction_id = None
-        if payment_method in ['eSewa', 'Khalti', 'IME Pay', 'Credit Card', 'Debit Card']:
-            transaction_id = f"{payment_method[:3].upper()}{random.randint(100000, 999999)}"
-        
-        payments.append({
-            'payment_id': order['order_id'],  # 1:1 relationship
-            'order_id': order['order_id'],
-            'payment_method': payment_method,
-            'amount': order['total_amount'],
-            'payment_date': payment_date,
-            'status': payment_status,
-            'transaction_id': transaction_id
-        })
-    
-    return payments
+    rng = rng if rng is not None else np.random.default_rng()
+    n = len(orders)
 
-def create_database_and_tables():
-    """Create DuckDB database and insert all data"""
-    
-    print("Generating customer data...")
-    customers = generate_customers(12000)
-    
-    print("Generating product data...")
-    products = generate_products(800)
-    
-    print("Generating order data...")
-    orders = generate_orders(50000, 12000)
-    
-    print("Generating order items data...")
-    order_items = generate_order_items(orders, 800)
-    
-    print("Generating payment data...")
-    payments = generate_payments(orders)
-    
-    print(f"Generated data summary:")
-    print(f"- Customers: {len(customers):,}")
-    print(f"- Products: {len(products):,}")
-    print(f"- Orders: {len(orders):,}")
-    print(f"- Order Items: {len(order_items):,}")
-    print(f"- Payments: {len(payments):,}")
-    
-    # Create DuckDB connection
-    conn = duckdb.connect('nepal_ecommerce.duckdb')
-    
-    print("\nCreating database tables...")
-    
-    # Create and populate customers table
-    customers_df = pd.DataFrame(customers)
-    conn.execute("DROP TABLE IF EXISTS customers")
-    conn.execute("""
+    payment_method = _weighted_choice(rng, PAYMENT_METHODS, PAYMENT_WEIGHTS, n)
+
+    # Payment date usually same as order date or shortly after (within 24 hours)
+    payment_date = orders['order_date'].to_numpy() + rng.integers(0, 1441, size=n).astype('timedelta64[m]')
+
+    # Transaction ID for digital payments
+    transaction_id = _to_str(payment_method).str[:3].str.upper() + _to_str(rng.integers(100000, 1000000, size=n))
+    transaction_id = transaction_id.where(np.isin(payment_method, DIGITAL_PAYMENT_METHODS), None)
+
+    return pd.DataFrame({
+        'payment_id': orders['order_id'].to_numpy(),  # 1:1 relationship
+        'order_id': orders['order_id'].to_numpy(),
+        'payment_method': payment_method,
+        'amount': orders['total_amount'].to_numpy(),
+        'payment_date': payment_date,
+        'status': _weighted_choice(rng, PAYMENT_STATUSES, PAYMENT_STATUS_WEIGHTS, n),
+        'transaction_id': transaction_id
+    })
+
+# Low-cardinality columns are DuckDB ENUMs over these fixed domains, so they
+# are stored, compared and grouped as small integer codes
+ENUM_TYPES = {
+    'customer_gender': GENDERS,
+    'product_category': list(PRODUCT_CATEGORIES),
+    'product_subcategory': list(dict.fromkeys(s for subs in PRODUCT_CATEGORIES.values() for s in subs)),
+    'product_brand': BRANDS,
+    'order_status': ORDER_STATUSES,
+    'payment_method': PAYMENT_METHODS,
+    'payment_status': PAYMENT_STATUSES
+}
+
+# dbt creates the same types in a target that lacks them, from a macro written
+# out of ENUM_TYPES by --write-enum-macro
+ENUM_MACRO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'macros', 'enum_types.sql')
+ENUM_MACRO_HEADER = """{#
+    Generated from ENUM_TYPES by `python generate_data.py --write-enum-macro`;
+    do not edit. create_enum_types() creates these types where the dbt target
+    lacks them, and tests/assert_enum_types_match_generator.sql fails when a
+    type in the target has other values.
+#}
+
+"""
+
+TABLE_DDL = {
+    'customers': """
         CREATE TABLE customers (
             customer_id INTEGER PRIMARY KEY,
             first_name VARCHAR,
@@ -267,40 +376,32 @@ def create_database_and_tables():
             email VARCHAR,
             phone VARCHAR,
             date_of_birth DATE,
-            gender VARCHAR,
+            gender customer_gender,
+            latitude DECIMAL(9,6),
+            longitude DECIMAL(9,6),
             created_at TIMESTAMP,
             updated_at TIMESTAMP
         )
-    """)
-    conn.execute("INSERT INTO customers SELECT * FROM customers_df")
-    
-    # Create and populate products table
-    products_df = pd.DataFrame(products)
-    conn.execute("DROP TABLE IF EXISTS products")
-    conn.execute("""
+    """,
+    'products': """
         CREATE TABLE products (
             product_id INTEGER PRIMARY KEY,
             name VARCHAR,
-            category VARCHAR,
-            subcategory VARCHAR,
-            brand VARCHAR,
+            category product_category,
+            subcategory product_subcategory,
+            brand product_brand,
             price DECIMAL(10,2),
             cost DECIMAL(10,2),
             weight_kg DECIMAL(5,2),
             created_at TIMESTAMP
         )
-    """)
-    conn.execute("INSERT INTO products SELECT * FROM products_df")
-    
-    # Create and populate orders table
-    orders_df = pd.DataFrame(orders)
-    conn.execute("DROP TABLE IF EXISTS orders")
-    conn.execute("""
+    """,
+    'orders': """
         CREATE TABLE orders (
             order_id INTEGER PRIMARY KEY,
             customer_id INTEGER,
             order_date TIMESTAMP,
-            status VARCHAR,
+            status order_status,
             total_amount DECIMAL(10,2),
             shipping_cost DECIMAL(10,2),
             discount_amount DECIMAL(10,2),
@@ -308,13 +409,8 @@ def create_database_and_tables():
             created_at TIMESTAMP,
             updated_at TIMESTAMP
         )
-    """)
-    conn.execute("INSERT INTO orders SELECT * FROM orders_df")
-    
-    # Create and populate order_items table
-    order_items_df = pd.DataFrame(order_items)
-    conn.execute("DROP TABLE IF EXISTS order_items")
-    conn.execute("""
+    """,
+    'order_items': """
         CREATE TABLE order_items (
             order_item_id INTEGER PRIMARY KEY,
             order_id INTEGER,
@@ -324,43 +420,716 @@ def create_database_and_tables():
             total_price DECIMAL(10,2),
             discount_amount DECIMAL(10,2)
         )
-    """)
-    conn.execute("INSERT INTO order_items SELECT * FROM order_items_df")
-    
-    # Create and populate payments table
-    payments_df = pd.DataFrame(payments)
-    conn.execute("DROP TABLE IF EXISTS payments")
-    conn.execute("""
+    """,
+    'payments': """
         CREATE TABLE payments (
             payment_id INTEGER PRIMARY KEY,
             order_id INTEGER,
-            payment_method VARCHAR,
+            payment_method payment_method,
             amount DECIMAL(10,2),
             payment_date TIMESTAMP,
-            status VARCHAR,
+            status payment_status,
             transaction_id VARCHAR
         )
+    """
+}
+
+# Rows per table at scale factor 1; every scale factor keeps these ratios
+SCALE_FACTOR_1_ROWS = {
+    'customers': 12000,
+    'products': 800,
+    'orders': 50000
+}
+
+def create_tables(conn):
+    """(Re)create the ENUM types and the empty source tables"""
+    # Tables keep their own copy of an ENUM's values, so types can be replaced
+    # while older tables or dbt models still use them
+    for name, values in ENUM_TYPES.items():
+        conn.execute(f"CREATE OR REPLACE TYPE {name} AS ENUM ({', '.join(_sql_literal(v) for v in values)})")
+    for table, ddl in TABLE_DDL.items():
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(ddl)
+
+def enum_types_macro():
+    """Source of the enum_types() dbt macro, which returns ENUM_TYPES"""
+    entries = []
+    for name, values in ENUM_TYPES.items():
+        literals = ["'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'" for value in values]
+        lines = ['']
+        for literal in literals:
+            if lines[-1] and len(lines[-1]) + len(literal) > 84:
+                lines.append('')
+            lines[-1] += (', ' if lines[-1] else '') + literal
+        if len(lines) == 1:
+            entries.append(f"        '{name}': [{lines[0]}]")
+        else:
+            entries.append(f"        '{name}': [\n" + ',\n'.join(' ' * 12 + line for line in lines) + "\n        ]")
+    return (ENUM_MACRO_HEADER + "{% macro enum_types() %}\n    {{ return({\n" + ',\n'.join(entries)
+            + "\n    }) }}\n{% endmacro %}\n")
+
+def write_enum_types_macro(path=ENUM_MACRO_PATH):
+    with open(path, 'w') as f:
+        f.write(enum_types_macro())
+    print(f"ENUM types written to '{path}'")
+
+def row_counts(scale_factor=1):
+    """Customer, product and order counts for a scale factor"""
+    return {table: max(1, int(round(rows * scale_factor))) for table, rows in SCALE_FACTOR_1_ROWS.items()}
+
+# Sharded generation. Every shard draws from its own stream derived from the
+# master seed and its shard index, so the data only depends on (seed, as-of
+# time, chunk size) and never on how many workers produced it. A shard is also
+# the unit that is held in memory and appended to DuckDB, so the chunk size
+# bounds peak memory regardless of the requested row counts.
+DEFAULT_SEED = 42
+DEFAULT_CHUNK_SIZE = 100000
+
+CUSTOMERS_STREAM = 0
+PRODUCTS_STREAM = 1
+ORDERS_STREAM = 2
+ORDER_ITEMS_STREAM = 3
+PAYMENTS_STREAM = 4
+
+def _shards(total, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Split ids 1..total into (shard, start_id, n) ranges"""
+    return [
+        (shard, start_id, min(chunk_size, total - start_id + 1))
+        for shard, start_id in enumerate(range(1, total + 1, chunk_size))
+    ]
+
+def _shard_rng(seed, stream, shard, substream=0):
+    return np.random.default_rng([seed, stream, shard, substream])
+
+def _shard_items_per_order(seed, shard, n, product_count):
+    """Items-per-order counts of an order shard, drawn from their own substream
+    so item id offsets can be planned without generating the shard"""
+    return _items_per_order(_shard_rng(seed, ORDERS_STREAM, shard, 1), n, product_count)
+
+def _timed(stats, stage, fn):
+    """Run fn as a stage of stats; worker processes run without stats"""
+    return fn() if stats is None else stats.timed(stage, fn)
+
+def generate_customer_shard(seed, shard, start_id, n, now, dropoffs, stats=None):
+    """Generate one shard of the customers table"""
+    rng = _shard_rng(seed, CUSTOMERS_STREAM, shard)
+    return (_timed(stats, 'customers', lambda: generate_customers(
+        n, rng=rng, start_id=start_id, now=now, dropoffs=dropoffs)),)
+
+def generate_order_shard(seed, shard, start_id, n, start_item_id, customer_dropoffs, product_prices, now,
+                         customer_skew=0.0, product_skew=0.0, stats=None):
+    """Generate one shard of orders together with its order items and payments"""
+    rng = _shard_rng(seed, ORDERS_STREAM, shard)
+    orders = _timed(stats, 'orders', lambda: generate_orders(
+        n, len(customer_dropoffs), rng=rng, start_id=start_id, now=now, customer_skew=customer_skew,
+        customer_dropoffs=customer_dropoffs))
+    num_items = _shard_items_per_order(seed, shard, n, len(product_prices))
+    order_items = _timed(stats, 'order_items', lambda: generate_order_items(
+        orders, product_prices, rng=rng, start_id=start_item_id, num_items=num_items, product_skew=product_skew))
+    payments = _timed(stats, 'payments', lambda: generate_payments(orders, rng=rng))
+    return orders, order_items, payments
+
+def _write_shard(spill_dir, tables, shard_fn, args):
+    """Worker entry point: generate a shard and write each table to Parquet"""
+    shard = args[1]
+    for table, df in zip(tables, shard_fn(*args)):
+        df.to_parquet(os.path.join(spill_dir, table, f"shard_{shard:06d}.parquet"), index=False)
+    return shard
+
+def _shard_batches(shard_fn, tasks, stats):
+    """Lazily generate shards, yielding each one as Arrow record batches"""
+    for args in tasks:
+        dfs = shard_fn(*args, stats=stats)
+        with stats.stage('arrow_batches', rows=sum(len(df) for df in dfs)):
+            batches = [pa.RecordBatch.from_pandas(df, preserve_index=False) for df in dfs]
+        del dfs
+        yield batches
+
+def nearest_customer_dropoffs(conn, dropoffs, stats):
+    """Nearest dropoff location id of every customer, at index customer_id - 1"""
+    with stats.stage('nearest_dropoff') as record:
+        index = DropoffIndex(dropoffs)
+        customers = conn.execute(
+            "SELECT latitude::DOUBLE AS latitude, longitude::DOUBLE AS longitude FROM customers ORDER BY customer_id"
+        ).fetchnumpy()
+        dropoff_ids, _ = index.nearest(customers['latitude'], customers['longitude'])
+        record['rows'] = len(dropoff_ids)
+    return dropoff_ids.astype(np.int32)
+
+def _insert(conn, stats, table, source_sql, data=None):
+    """Append rows to a table as an insert_<table> stage; source_sql can read a DataFrame or batch as `data`"""
+    with stats.stage(f'insert_{table}') as record:
+        record['rows'] = conn.execute(f"INSERT INTO {table} {source_sql}").fetchone()[0]
+
+def _load_shards(conn, pool, spill_dir, tables, shard_fn, tasks, stats):
+    """Generate shards and append them to their tables.
+
+    Without a pool shards are generated one at a time and appended as Arrow
+    record batches, so only a single chunk is alive at any point. With a pool
+    each worker writes its shard to Parquet and DuckDB reads all of them in a
+    single parallel scan, so no rows pass back through this process.
+    """
+    if pool is None:
+        for batches in _shard_batches(shard_fn, tasks, stats):
+            for table, batch in zip(tables, batches):
+                _insert(conn, stats, table, "SELECT * FROM data", batch)
+            # Drop the chunk before the next one is generated
+            del batches, batch
+        return
+
+    for table in tables:
+        os.makedirs(os.path.join(spill_dir, table), exist_ok=True)
+    # Worker processes are timed as a whole; rows are those of the shards' first table
+    with stats.stage(f'{tables[0]}_shards', rows=sum(args[3] for args in tasks)):
+        list(pool.map(_write_shard, repeat(spill_dir), repeat(tables), repeat(shard_fn), tasks))
+    for table in tables:
+        files = os.path.join(spill_dir, table, '*.parquet')
+        _insert(conn, stats, table, f"SELECT * FROM read_parquet('{files}')")
+
+# In-database generation. Every random draw is a hash of (seed, stream, row id,
+# column), so the SQL engine is deterministic for a given seed and as-of time
+# no matter how DuckDB splits the work across its threads.
+WEIGHT_BUCKETS = 1000
+
+# Product ranks the SQL engine draws per order to find up to four distinct
+# items; drawn with rand_uniform columns 10 and up of the order id
+ORDER_ITEM_RANK_DRAWS = 12
+
+def _sql_literal(value):
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+def _sql_list(values):
+    return '[' + ', '.join(_sql_literal(value) for value in values) + ']'
+
+def _weight_lookup_rows(domain, values, weights):
+    """Expand weights into WEIGHT_BUCKETS buckets so a weighted draw becomes an equi-join"""
+    weights = np.asarray(weights, dtype=float)
+    bounds = np.round(np.cumsum(weights / weights.sum()) * WEIGHT_BUCKETS).astype(int)
+    value_idx = np.searchsorted(bounds, np.arange(WEIGHT_BUCKETS), side='right')
+    return [(domain, bucket, str(values[idx])) for bucket, idx in enumerate(value_idx)]
+
+def _create_sql_helpers(conn, seed):
+    """Create the seeded random macros and the weighted-choice lookup table"""
+    # hash() of a single integer mixes well, hash() of several arguments does
+    # not, so (row id, column) is packed into one key and salted per stream
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP MACRO rand_uniform(stream, id, col) AS
+            hash(xor(hash({int(seed)} * 8 + stream), (id * 32 + col)::UBIGINT)) / 18446744073709551616.0
     """)
-    conn.execute("INSERT INTO payments SELECT * FROM payments_df")
-    
-    print("Database created successfully!")
+    conn.execute("""
+        CREATE OR REPLACE TEMP MACRO rand_int(stream, id, col, low, high) AS
+            (low + floor(rand_uniform(stream, id, col) * (high - low + 1)))::BIGINT
+    """)
+    conn.execute("""
+        CREATE OR REPLACE TEMP MACRO rand_bucket(stream, id, col) AS
+            floor(rand_uniform(stream, id, col) * %d)::INTEGER
+    """ % WEIGHT_BUCKETS)
+
+    rows = (
+        _weight_lookup_rows('order_status', ORDER_STATUSES, ORDER_STATUS_WEIGHTS)
+        + _weight_lookup_rows('payment_method', PAYMENT_METHODS, PAYMENT_WEIGHTS)
+        + _weight_lookup_rows('payment_status', PAYMENT_STATUSES, PAYMENT_STATUS_WEIGHTS)
+        + _weight_lookup_rows('items_per_order', ITEMS_PER_ORDER, ITEMS_PER_ORDER_WEIGHTS)
+        + _weight_lookup_rows('item_quantity', ITEM_QUANTITIES, ITEM_QUANTITY_WEIGHTS)
+    )
+    weighted_choices = pd.DataFrame(rows, columns=['domain', 'bucket', 'value'])
+    conn.execute("CREATE OR REPLACE TEMP TABLE weighted_choices AS SELECT * FROM weighted_choices")
+
+def _weighted(domain, alias):
+    return f"""JOIN weighted_choices {alias} ON {alias}.domain = '{domain}'"""
+
+def _sql_power_law_rank(stream, id_sql, col, domain, skew):
+    """SQL for _power_law_ranks over one seeded draw; a plain rand_int for skew 0"""
+    if skew == 0:
+        return f"rand_int({stream}, {id_sql}, {col}, 1, {domain})"
+    u = f"rand_uniform({stream}, {id_sql}, {col})"
+    if skew == 1:
+        ranks = f"exp({u} * ln({domain + 1}))"
+    else:
+        ranks = f"power(({float(domain + 1) ** (1 - skew) - 1!r}) * {u} + 1, {1 / (1 - skew)!r})"
+    return f"LEAST(floor({ranks})::BIGINT, {domain})"
+
+def _sql_skewed_id(stream, id_sql, col, domain, skew):
+    """SQL for _skewed_ids over one seeded draw"""
+    rank = _sql_power_law_rank(stream, id_sql, col, domain, skew)
+    multiplier = _scatter_multiplier(domain, skew)
+    return rank if multiplier == 1 else f"1 + ({rank} - 1) * {multiplier} % {domain}"
+
+def sql_insert_statements(now, customer_count, product_count, order_count, customer_skew=0.0, product_skew=0.0,
+                          dropoffs=None):
+    """Build the INSERT statement for each table, in dependency order.
+
+    The orders statement reads each customer's nearest dropoff location from a
+    customer_dropoffs table, see populate_tables_sql.
+    """
+    dropoffs = load_dropoff_locations() if dropoffs is None else dropoffs
+    now_sql = f"TIMESTAMP '{now:%Y-%m-%d %H:%M:%S}'"
+    oldest_birth = _years_before(now.date(), 71) + timedelta(days=1)
+    youngest_birth = _years_before(now.date(), 18)
+    two_years = 2 * 365 * 86400
+    one_year = 365 * 86400
+    categories = list(PRODUCT_CATEGORIES.keys())
+    subcategory_lists = '[' + ', '.join(_sql_list(PRODUCT_CATEGORIES[c]) for c in categories) + ']'
+    price_lows = _sql_list([CATEGORY_PRICE_RANGES[c][0] for c in categories])
+    price_highs = _sql_list([CATEGORY_PRICE_RANGES[c][1] for c in categories])
+    # Customer locations: a random dropoff location plus a Box-Muller normal offset in km
+    dropoff_lats = _sql_list(dropoffs['latitude'].tolist())
+    dropoff_lons = _sql_list(dropoffs['longitude'].tolist())
+    radius = f"{CUSTOMER_SPREAD_KM!r} * sqrt(-2 * ln(1 - rand_uniform({CUSTOMERS_STREAM}, customer_id, 11)))"
+    angle = f"2 * pi() * rand_uniform({CUSTOMERS_STREAM}, customer_id, 12)"
+    statements = {}
+
+    statements['customers'] = f"""
+        INSERT INTO customers
+        WITH base AS (
+            SELECT
+                range AS customer_id,
+                {_sql_list(NEPAL_FIRST_NAMES)}[rand_int({CUSTOMERS_STREAM}, range, 0, 1, {len(NEPAL_FIRST_NAMES)})] AS first_name,
+                {_sql_list(NEPAL_LAST_NAMES)}[rand_int({CUSTOMERS_STREAM}, range, 1, 1, {len(NEPAL_LAST_NAMES)})] AS last_name,
+                {now_sql} - to_seconds(rand_int({CUSTOMERS_STREAM}, range, 2, 0, {two_years})) AS created_at,
+                rand_int({CUSTOMERS_STREAM}, range, 10, 1, {len(dropoffs)}) AS anchor
+            FROM range(1, {customer_count + 1})
+        )
+        SELECT
+            customer_id,
+            first_name,
+            last_name,
+            lower(first_name) || '.' || lower(last_name) || rand_int({CUSTOMERS_STREAM}, customer_id, 3, 1, 999)
+                || '@' || {_sql_list(EMAIL_DOMAINS)}[rand_int({CUSTOMERS_STREAM}, customer_id, 4, 1, {len(EMAIL_DOMAINS)})],
+            '+977-' || rand_int({CUSTOMERS_STREAM}, customer_id, 5, 980, 989)
+                || '-' || rand_int({CUSTOMERS_STREAM}, customer_id, 6, 1000000, 9999999),
+            DATE '{oldest_birth}' + rand_int({CUSTOMERS_STREAM}, customer_id, 7, 0, {(youngest_birth - oldest_birth).days})::INTEGER,
+            {_sql_list(GENDERS)}[rand_int({CUSTOMERS_STREAM}, customer_id, 8, 1, {len(GENDERS)})],
+            ROUND({dropoff_lats}[anchor] + {radius} * cos({angle}) / {KM_PER_DEGREE_LAT!r}, 6),
+            ROUND({dropoff_lons}[anchor] + {radius} * sin({angle}) / {float(km_per_degree_lon(dropoffs))!r}, 6),
+            created_at,
+            created_at + to_days(rand_int({CUSTOMERS_STREAM}, customer_id, 9, 0, 30)::INTEGER)
+        FROM base
+        ORDER BY customer_id
+    """
+
+    statements['products'] = f"""
+        INSERT INTO products
+        WITH base AS (
+            SELECT
+                range AS product_id,
+                rand_int({PRODUCTS_STREAM}, range, 0, 1, {len(categories)}) AS category_idx,
+                {_sql_list(BRANDS)}[rand_int({PRODUCTS_STREAM}, range, 1, 1, {len(BRANDS)})] AS brand
+            FROM range(1, {product_count + 1})
+        ),
+        priced AS (
+            SELECT
+                *,
+                {_sql_list(categories)}[category_idx] AS category,
+                list_element({subcategory_lists}[category_idx], rand_int({PRODUCTS_STREAM}, product_id, 2, 1,
+                    len({subcategory_lists}[category_idx]))) AS subcategory,
+                rand_int({PRODUCTS_STREAM}, product_id, 3,
+                    {price_lows}[category_idx], {price_highs}[category_idx]) AS price
+            FROM base
+        )
+        SELECT
+            product_id,
+            brand || ' ' || subcategory,
+            category,
+            subcategory,
+            brand,
+            price,
+            ROUND(price * (0.4 + 0.3 * rand_uniform({PRODUCTS_STREAM}, product_id, 4)), 2),
+            ROUND(0.1 + 4.9 * rand_uniform({PRODUCTS_STREAM}, product_id, 5), 2),
+            {now_sql} - to_seconds(rand_int({PRODUCTS_STREAM}, product_id, 6, 0, {one_year}))
+        FROM priced
+        ORDER BY product_id
+    """
+
+    statements['orders'] = f"""
+        INSERT INTO orders
+        WITH base AS (
+            SELECT
+                range AS order_id,
+                {_sql_skewed_id(ORDERS_STREAM, 'range', 5, customer_count, customer_skew)} AS customer_id,
+                {now_sql} - to_seconds(rand_int({ORDERS_STREAM}, range, 0, 0, {one_year})) AS order_date,
+                rand_int({ORDERS_STREAM}, range, 1, 500, 25000) AS base_amount,
+                {_sql_list(SHIPPING_COSTS)}[rand_int({ORDERS_STREAM}, range, 2, 1, {len(SHIPPING_COSTS)})] AS shipping_cost,
+                CASE WHEN rand_uniform({ORDERS_STREAM}, range, 3) < 0.3
+                    THEN rand_uniform({ORDERS_STREAM}, range, 4) * 0.15 ELSE 0 END AS discount_rate
+            FROM range(1, {order_count + 1})
+        )
+        SELECT
+            o.order_id,
+            o.customer_id,
+            o.order_date,
+            s.value,
+            ROUND(o.base_amount + o.shipping_cost - o.base_amount * o.discount_rate, 2),
+            o.shipping_cost,
+            ROUND(o.base_amount * o.discount_rate, 2),
+            d.dropoff_id,
+            o.order_date,
+            o.order_date + to_days(rand_int({ORDERS_STREAM}, o.order_id, 7, 0, 7)::INTEGER)
+        FROM base o
+        JOIN customer_dropoffs d ON d.customer_id = o.customer_id
+        {_weighted('order_status', 's')} AND s.bucket = rand_bucket({ORDERS_STREAM}, o.order_id, 8)
+        ORDER BY o.order_id
+    """
+
+    # Every item's product rank is drawn from the power law on its own, as in
+    # _sample_distinct_products: each order draws ORDER_ITEM_RANK_DRAWS ranks
+    # and keeps the first distinct ones, so a repeat is replaced by a fresh
+    # draw. The lowest ranks are appended in case the draws hold too few
+    # distinct ranks, which only happens under extreme skew.
+    product_multiplier = _scatter_multiplier(product_count, product_skew)
+    fallback_ranks = list(range(1, min(max(ITEMS_PER_ORDER), product_count) + 1))
+    statements['order_items'] = f"""
+        INSERT INTO order_items
+        WITH counts AS (
+            SELECT
+                o.order_id,
+                LEAST(n.value::INTEGER, {product_count}) AS num_items,
+                list_transform(range({ORDER_ITEM_RANK_DRAWS}),
+                    k -> {_sql_power_law_rank(ORDER_ITEMS_STREAM, 'o.order_id', '10 + k', product_count, product_skew)})
+                    || {fallback_ranks} AS draws
+            FROM orders o
+            {_weighted('items_per_order', 'n')} AND n.bucket = rand_bucket({ORDER_ITEMS_STREAM}, o.order_id, 4)
+        ),
+        items AS (
+            SELECT
+                order_id,
+                SUM(num_items) OVER (ORDER BY order_id ROWS UNBOUNDED PRECEDING) - num_items AS items_before,
+                UNNEST(range(num_items)) AS item_idx,
+                UNNEST(list_filter(draws, (r, i) -> list_position(draws, r) = i)[1:num_items]) AS product_rank
+            FROM counts
+        ),
+        priced AS (
+            SELECT
+                i.items_before + i.item_idx + 1 AS order_item_id,
+                i.order_id,
+                1 + (i.product_rank - 1) * {product_multiplier} % {product_count} AS product_id
+            FROM items i
+        ),
+        drawn AS (
+            SELECT
+                p.*,
+                q.value::INTEGER AS quantity,
+                -- Unit price is the product's price with a slight variation
+                pr.price * (0.9 + 0.2 * rand_uniform({ORDER_ITEMS_STREAM}, p.order_item_id, 6)) AS unit_price,
+                CASE WHEN rand_uniform({ORDER_ITEMS_STREAM}, p.order_item_id, 7) < 0.2
+                    THEN rand_uniform({ORDER_ITEMS_STREAM}, p.order_item_id, 8) * 0.1 ELSE 0 END AS discount_rate
+            FROM priced p
+            JOIN products pr ON pr.product_id = p.product_id
+            {_weighted('item_quantity', 'q')} AND q.bucket = rand_bucket({ORDER_ITEMS_STREAM}, p.order_item_id, 9)
+        )
+        SELECT
+            order_item_id,
+            order_id,
+            product_id,
+            quantity,
+            ROUND(unit_price, 2),
+            ROUND(unit_price * quantity * (1 - discount_rate), 2),
+            ROUND(unit_price * quantity * discount_rate, 2)
+        FROM drawn
+        ORDER BY order_item_id
+    """
+
+    digital_methods = _sql_list(DIGITAL_PAYMENT_METHODS)
+    statements['payments'] = f"""
+        INSERT INTO payments
+        SELECT
+            o.order_id,
+            o.order_id,
+            m.value,
+            o.total_amount,
+            o.order_date + to_minutes(rand_int({PAYMENTS_STREAM}, o.order_id, 0, 0, 1440)),
+            s.value,
+            CASE WHEN list_contains({digital_methods}, m.value)
+                THEN upper(m.value[1:3]) || rand_int({PAYMENTS_STREAM}, o.order_id, 1, 100000, 999999) END
+        FROM orders o
+        {_weighted('payment_method', 'm')} AND m.bucket = rand_bucket({PAYMENTS_STREAM}, o.order_id, 2)
+        {_weighted('payment_status', 's')} AND s.bucket = rand_bucket({PAYMENTS_STREAM}, o.order_id, 3)
+        ORDER BY o.order_id
+    """
+    return statements
+
+def populate_tables_sql(conn, seed, now, customer_count, product_count, order_count,
+                        customer_skew=0.0, product_skew=0.0, dropoffs=None, stats=None):
+    """Generate all five tables with set-based SQL inside DuckDB"""
+    stats = stats or StageStats('generate_data')
+    dropoffs = load_dropoff_locations() if dropoffs is None else dropoffs
+    with stats.stage('sql_helpers'):
+        _create_sql_helpers(conn, seed)
+    statements = sql_insert_statements(now, customer_count, product_count, order_count, customer_skew, product_skew,
+                                       dropoffs)
+    for table, statement in statements.items():
+        print(f"Generating {table.replace('_', ' ')} data...")
+        with stats.stage(table) as record:
+            record['rows'] = conn.execute(statement).fetchone()[0]
+        if table == 'customers':
+            # Orders ship to their customer's nearest dropoff location
+            dropoff_ids = nearest_customer_dropoffs(conn, dropoffs, stats)
+            customer_dropoffs = pd.DataFrame({
+                'customer_id': np.arange(1, len(dropoff_ids) + 1),
+                'dropoff_id': dropoff_ids
+            })
+            conn.execute("CREATE OR REPLACE TEMP TABLE customer_dropoffs AS SELECT * FROM customer_dropoffs")
+
+# Order-level tables are Hive-partitioned by the month the order was placed
+PARTITIONED_TABLE_SQL = {
+    'orders': """
+        SELECT *, DATE_TRUNC('month', order_date)::DATE AS order_month
+        FROM orders
+    """,
+    'order_items': """
+        SELECT oi.*, DATE_TRUNC('month', o.order_date)::DATE AS order_month
+        FROM order_items oi
+        JOIN orders o ON oi.order_id = o.order_id
+    """,
+    'payments': """
+        SELECT p.*, DATE_TRUNC('month', o.order_date)::DATE AS order_month
+        FROM payments p
+        JOIN orders o ON p.order_id = o.order_id
+    """
+}
+
+def export_csv(conn, stats=None):
+    """Export every table to CSV for dbt seeds/testing"""
+    stats = stats or StageStats('generate_data')
+    # Chunks are appended in key order, so the export streams without a sort
+    print("\nExporting to CSV files...")
+    for table in TABLE_DDL:
+        with stats.stage(f'export_csv_{table}') as record:
+            record['rows'] = conn.execute(f"COPY {table} TO '{table}.csv' (HEADER)").fetchone()[0]
+
+def export_parquet(conn, output_dir='parquet', stats=None):
+    """Export every table to zstd-compressed Parquet under output_dir/<table>/.
+
+    This layout is what the ecommerce_parquet source in models/staging/sources.yml reads.
+    """
+    stats = stats or StageStats('generate_data')
+    print(f"\nExporting to Parquet files in '{output_dir}'...")
+    for table in TABLE_DDL:
+        table_dir = os.path.join(output_dir, table)
+        shutil.rmtree(table_dir, ignore_errors=True)
+        with stats.stage(f'export_parquet_{table}') as record:
+            if table in PARTITIONED_TABLE_SQL:
+                record['rows'] = conn.execute(f"""
+                    COPY ({PARTITIONED_TABLE_SQL[table]}) TO '{table_dir}'
+                    (FORMAT parquet, COMPRESSION zstd, PARTITION_BY (order_month))
+                """).fetchone()[0]
+            else:
+                os.makedirs(table_dir)
+                record['rows'] = conn.execute(f"""
+                    COPY {table} TO '{os.path.join(table_dir, table + '.parquet')}'
+                    (FORMAT parquet, COMPRESSION zstd)
+                """).fetchone()[0]
+
+def populate_tables_numpy(conn, seed, now, customer_count, product_count, order_count,
+                          workers=1, chunk_size=DEFAULT_CHUNK_SIZE, spill_root='.', customer_skew=0.0,
+                          product_skew=0.0, dropoffs=None, stats=None):
+    """Generate all five tables with the NumPy generators, chunk by chunk"""
+    stats = stats or StageStats('generate_data')
+    dropoffs = load_dropoff_locations() if dropoffs is None else dropoffs
+    # Plan order item id ranges up front so every shard knows its offset
+    order_shards = _shards(order_count, chunk_size)
+    item_counts = [int(_shard_items_per_order(seed, shard, n, product_count).sum()) for shard, _, n in order_shards]
+    item_offsets = np.concatenate([[1], 1 + np.cumsum(item_counts)[:-1]]).astype(int)
+
+    spill_dir = tempfile.mkdtemp(prefix='shards_', dir=spill_root)
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) if workers > 1 else None
+    try:
+        print("Generating customer data...")
+        _load_shards(conn, pool, spill_dir, ['customers'], generate_customer_shard, [
+            (seed, shard, start_id, n, now, dropoffs) for shard, start_id, n in _shards(customer_count, chunk_size)
+        ], stats)
+        # Orders ship to their customer's nearest dropoff location
+        customer_dropoffs = nearest_customer_dropoffs(conn, dropoffs, stats)
+
+        print("Generating product data...")
+        products_df = stats.timed('products', lambda: generate_products(
+            product_count, rng=_shard_rng(seed, PRODUCTS_STREAM, 0), now=now))
+        _insert(conn, stats, 'products', "SELECT * FROM data", products_df)
+        product_prices = products_df['price'].to_numpy()
+
+        print("Generating order, order items and payment data...")
+        _load_shards(conn, pool, spill_dir, ['orders', 'order_items', 'payments'], generate_order_shard, [
+            (seed, shard, start_id, n, int(item_offsets[shard]), customer_dropoffs, product_prices, now,
+             customer_skew, product_skew)
+            for shard, start_id, n in order_shards
+        ], stats)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+def _cache_params(seed, now, customer_count, product_count, order_count, chunk_size, engine,
+                  customer_skew, product_skew, dropoffs_path):
+    """Everything that determines the generated rows, hashed into the dataset cache key"""
+    return {
+        # Covers the distribution constants, DDL and ENUM types defined in this file
+        'generator': source_fingerprint(__file__),
+        'dropoff_index': source_fingerprint(inspect.getfile(DropoffIndex)),
+        'dropoff_locations': source_fingerprint(dropoffs_path),
+        'duckdb': duckdb.__version__,
+        'numpy': np.__version__,
+        'engine': engine,
+        'seed': seed,
+        'as_of': now.isoformat(),
+        'customers': customer_count,
+        'products': product_count,
+        'orders': order_count,
+        # The NumPy engine seeds each chunk separately; the worker count does not change the rows
+        'chunk_size': chunk_size if engine == 'numpy' else None,
+        'customer_skew': customer_skew,
+        'product_skew': product_skew
+    }
+
+def create_database_and_tables(seed=DEFAULT_SEED, workers=1, now=None, db_path='nepal_ecommerce.duckdb',
+                               customer_count=12000, product_count=800, order_count=50000,
+                               chunk_size=DEFAULT_CHUNK_SIZE, memory_limit=None, export='csv',
+                               output_dir='parquet', engine='numpy', stats_jsonl=None, stats_table=DEFAULT_STATS_TABLE,
+                               customer_skew=0.0, product_skew=0.0, cache_dir=None, cache_max_gb=DEFAULT_MAX_GB,
+                               dropoffs_path=DEFAULT_DROPOFF_CSV):
+    """Create DuckDB database and insert all data.
+
+    Customers are placed around the dropoff locations in dropoffs_path and
+    every order ships to its customer's nearest one.
+
+    Stage timings are appended to stats_table in the database (unless None)
+    and to the stats_jsonl file if given. With a cache_dir and a fixed `now`,
+    the finished database and its export are cached under a hash of the
+    generation parameters, and a later run with the same parameters copies
+    them instead of generating the data again.
+    """
+    cache = None
+    if cache_dir and now is None:
+        print("Not using the dataset cache: pass --as-of for a reproducible dataset")
+    elif cache_dir:
+        cache = DatasetCache(cache_dir, cache_max_gb)
+        params = _cache_params(seed, now, customer_count, product_count, order_count, chunk_size, engine,
+                               customer_skew, product_skew, dropoffs_path)
+        key = cache_key(params)
+    now = now or _now()
+    stats = StageStats('generate_data')
+    config = {'memory_limit': memory_limit} if memory_limit else {}
+    hit = cache is not None and cache.contains(key)
+
+    if hit:
+        print(f"Restoring dataset {key} from the cache in '{cache_dir}'...")
+        with stats.stage('cache_restore'):
+            cache.restore(key, db_path)
+        conn = duckdb.connect(db_path, config=config)
+    else:
+        if engine == 'sql':
+            print(f"Generating data in DuckDB with seed {seed} as of {now}")
+        else:
+            print(f"Generating data with seed {seed} as of {now} using {workers} worker(s), "
+                  f"{chunk_size:,} rows per chunk")
+
+        # Create DuckDB connection
+        conn = duckdb.connect(db_path, config=config)
+
+        print("\nCreating database tables...")
+        create_tables(conn)
+        dropoffs = load_dropoff_locations(dropoffs_path)
+
+        if engine == 'sql':
+            populate_tables_sql(conn, seed, now, customer_count, product_count, order_count,
+                                customer_skew=customer_skew, product_skew=product_skew, dropoffs=dropoffs,
+                                stats=stats)
+        else:
+            populate_tables_numpy(conn, seed, now, customer_count, product_count, order_count,
+                                  workers=workers, chunk_size=chunk_size, spill_root=os.path.dirname(os.path.abspath(db_path)),
+                                  customer_skew=customer_skew, product_skew=product_skew, dropoffs=dropoffs,
+                                  stats=stats)
+
+        print("Database created successfully!")
     
     # Show table counts
     print("\nTable row counts:")
-    for table in ['customers', 'products', 'orders', 'order_items', 'payments']:
+    for table in TABLE_DDL:
         count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
         print(f"- {table}: {count:,}")
     
-    # Optional: Export to CSV files for dbt seeds/testing
-    print("\nExporting to CSV files...")
-    customers_df.to_csv('customers.csv', index=False)
-    products_df.to_csv('products.csv', index=False)
-    orders_df.to_csv('orders.csv', index=False)
-    order_items_df.to_csv('order_items.csv', index=False)
-    payments_df.to_csv('payments.csv', index=False)
+    export_cached = hit and export != 'none' and cache.has_export(key, export)
+    if export_cached:
+        print(f"\nRestoring the {export} export from the cache...")
+        with stats.stage(f'cache_restore_{export}'):
+            cache.restore_export(key, export, output_dir)
+    elif export == 'csv':
+        export_csv(conn, stats)
+    elif export == 'parquet':
+        export_parquet(conn, output_dir, stats)
+
+    if cache and not hit:
+        # Closing checkpoints the database; the entry leaves out this run's stage timings
+        conn.close()
+        with stats.stage('cache_store'):
+            cache.store(key, params, db_path, TABLE_DDL, export, output_dir)
+        conn = duckdb.connect(db_path, config=config)
+        print(f"\nCached dataset {key} in '{cache_dir}'")
+    elif hit and export != 'none' and not export_cached:
+        with stats.stage('cache_store'):
+            cache.store_export(key, TABLE_DDL, export, output_dir)
+    
+    print(f"\nStage timings (run {stats.run_id}):")
+    stats.print_summary()
+    if stats_table:
+        stats.write_table(conn, stats_table)
+    if stats_jsonl:
+        stats.write_jsonl(stats_jsonl)
     
     conn.close()
-    print("All done! Database saved as 'nepal_ecommerce.duckdb'")
+    print(f"All done! Database saved as '{db_path}'")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the Nepal e-commerce DuckDB database")
+    parser.add_argument('--engine', choices=['numpy', 'sql'], default='numpy',
+                        help="Generate rows with NumPy in Python or entirely inside DuckDB")
+    parser.add_argument('--scale-factor', type=float, default=1,
+                        help="Scales all tables together; 1 = 12,000 customers, 800 products, 50,000 orders")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help="Master seed for all generated data")
+    parser.add_argument('--workers', type=int, default=1, help="Number of generator processes")
+    parser.add_argument('--as-of', type=datetime.fromisoformat, default=None,
+                        help="Timestamp treated as 'now' (ISO format); fix it for reproducible runs")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Rows generated and appended per chunk; bounds peak memory (part of the seed layout)")
+    parser.add_argument('--memory-limit', default=None, help="DuckDB memory limit, e.g. '1GB'")
+    parser.add_argument('--export', choices=['csv', 'parquet', 'none'], default='csv',
+                        help="Export format written after the database is built")
+    parser.add_argument('--output-dir', default='parquet', help="Directory for the Parquet export")
+    parser.add_argument('--customer-skew', type=float, default=0.0,
+                        help="Zipf exponent of orders per customer; 0 = uniform, ~1 = a few heavy buyers")
+    parser.add_argument('--product-skew', type=float, default=0.0,
+                        help="Zipf exponent of items per product; 0 = uniform, ~1 = a few best sellers")
+    parser.add_argument('--db-path', default='nepal_ecommerce.duckdb')
+    parser.add_argument('--dropoff-locations', default=DEFAULT_DROPOFF_CSV,
+                        help="CSV of dropoff locations (id, name, latitude, longitude) that orders ship to; "
+                             "should match the dropoff_locations seed")
+    parser.add_argument('--stats-jsonl', default=None, help="Also append stage timings to this JSON lines file")
+    parser.add_argument('--stats-table', default=DEFAULT_STATS_TABLE,
+                        help="Table in the database that stage timings are appended to; '' to skip")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help="Dataset cache directory (default $NEPAL_ECOMMERCE_CACHE_DIR or ~/.cache/nepal_ecommerce); "
+                             "only used with --as-of")
+    parser.add_argument('--cache-max-gb', type=float, default=DEFAULT_MAX_GB,
+                        help="Evict the least recently used datasets beyond this size")
+    parser.add_argument('--no-cache', action='store_true', help="Always generate, and do not cache the result")
+    parser.add_argument('--write-enum-macro', action='store_true',
+                        help="Write macros/enum_types.sql from ENUM_TYPES and exit")
+    args = parser.parse_args()
+    if args.write_enum_macro:
+        write_enum_types_macro()
+        return
+    counts = row_counts(args.scale_factor)
+
+    create_database_and_tables(
+        seed=args.seed, workers=args.workers, now=args.as_of, db_path=args.db_path,
+        customer_count=counts['customers'], product_count=counts['products'], order_count=counts['orders'],
+        chunk_size=args.chunk_size, memory_limit=args.memory_limit, export=args.export,
+        output_dir=args.output_dir, engine=args.engine, stats_jsonl=args.stats_jsonl,
+        stats_table=args.stats_table, customer_skew=args.customer_skew, product_skew=args.product_skew,
+        cache_dir=None if args.no_cache else args.cache_dir, cache_max_gb=args.cache_max_gb,
+        dropoffs_path=args.dropoff_locations
+    )
 
 if __name__ == "__main__":
-    create_database_and_tables()
\ No newline at end of file
+    main()
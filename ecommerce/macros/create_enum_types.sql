@@ -0,0 +1,16 @@
+{#
+    On-run-start hook creating the ENUM types that staging models and
+    snapshots cast to, with the values of enum_types(). generate_data.py
+    creates them in the database it writes; this covers a dbt target without
+    them, e.g. a fresh database reading the Parquet export. Existing types
+    are left as they are.
+#}
+{% macro create_enum_types() %}
+    {%- for name, values in enum_types().items() %}
+    CREATE TYPE IF NOT EXISTS {{ name }} AS ENUM (
+        {%- for value in values -%}
+        '{{ value | replace("'", "''") }}'{% if not loop.last %}, {% endif %}
+        {%- endfor -%}
+    );
+    {%- endfor %}
+{% endmacro %}
@@ -0,0 +1,28 @@
+{#
+    Resolves a raw ecommerce table to either the DuckDB tables (default) or
+    the Parquet export, depending on the `ecommerce_source_format` var.
+#}
+{% macro ecommerce_source(table_name) %}
+    {%- if ecommerce_source_is_parquet() -%}
+        {{ source('ecommerce_parquet', table_name) }}
+    {%- else -%}
+        {{ source('ecommerce', table_name) }}
+    {%- endif -%}
+{% endmacro %}
+
+{% macro ecommerce_source_is_parquet() %}
+    {{ return(var('ecommerce_source_format', 'duckdb') == 'parquet') }}
+{% endmacro %}
+
+{#
+    The month an order was placed. The Parquet export is Hive-partitioned by
+    it, so the partition column is passed through as is: a filter on it then
+    skips whole files. The DuckDB tables derive it from the order date.
+#}
+{% macro ecommerce_order_month(table_alias, order_date) %}
+    {%- if ecommerce_source_is_parquet() -%}
+        CAST({{ table_alias }}.order_month AS DATE)
+    {%- else -%}
+        CAST(DATE_TRUNC('month', {{ order_date }}) AS DATE)
+    {%- endif -%}
+{% endmacro %}
@@ -0,0 +1,36 @@
+{#
+    Generated from ENUM_TYPES by `python generate_data.py --write-enum-macro`;
+    do not edit. create_enum_types() creates these types where the dbt target
+    lacks them, and tests/assert_enum_types_match_generator.sql fails when a
+    type in the target has other values.
+#}
+
+{% macro enum_types() %}
+    {{ return({
+        'customer_gender': ['Male', 'Female'],
+        'product_category': [
+            'Electronics', 'Fashion', 'Home & Kitchen', 'Books', 'Health & Beauty', 'Sports',
+            'Groceries'
+        ],
+        'product_subcategory': [
+            'Mobile Phone', 'Laptop', 'Headphones', 'Speaker', 'Charger', 'Power Bank', 'Camera',
+            'T-Shirt', 'Jeans', 'Kurta', 'Saree', 'Shoes', 'Sandals', 'Bag', 'Watch',
+            'Rice Cooker', 'Blender', 'Pressure Cooker', 'Thermos', 'Dinner Set', 'Curtain',
+            'Novel', 'Textbook', 'Dictionary', 'Magazine', 'Comic Book', 'Face Cream', 'Shampoo',
+            'Soap', 'Toothpaste', 'Perfume', 'Makeup Kit', 'Football', 'Cricket Bat',
+            'Badminton Racket', 'Running Shoes', 'Yoga Mat', 'Rice', 'Dal', 'Oil', 'Spices', 'Tea',
+            'Biscuits', 'Noodles'
+        ],
+        'product_brand': [
+            'Samsung', 'Apple', 'Xiaomi', 'Dell', 'HP', 'Sony', 'LG', 'Panasonic', 'Nike',
+            'Adidas', 'Puma', 'Zara', 'H&M', 'Local Brand', 'Generic', 'Dabur', 'Himalaya',
+            'Unilever', 'P&G', 'Goldstar', 'CG', 'Bajaj'
+        ],
+        'order_status': ['pending', 'confirmed', 'shipped', 'delivered', 'cancelled', 'returned'],
+        'payment_method': [
+            'eSewa', 'Khalti', 'IME Pay', 'Cash on Delivery', 'Bank Transfer', 'Credit Card',
+            'Debit Card'
+        ],
+        'payment_status': ['pending', 'completed', 'failed', 'refunded']
+    }) }}
+{% endmacro %}
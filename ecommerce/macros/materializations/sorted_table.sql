@@ -0,0 +1,61 @@
+{#
+    Like the table materialization, but writes rows ordered by the model's
+    `sort_by` config (a column or list of columns). DuckDB keeps min/max
+    zone maps per row group, so filters and joins on the leading sort keys
+    can skip most of a sorted table. Without `sort_by` it builds a plain
+    table.
+#}
+{% materialization sorted_table, adapter="duckdb" %}
+
+  {%- set sort_by = config.get('sort_by') -%}
+  {%- if sort_by is string -%}
+    {%- set sort_by = [sort_by] -%}
+  {%- endif -%}
+
+  {%- set existing_relation = load_cached_relation(this) -%}
+  {%- set target_relation = this.incorporate(type='table') -%}
+  {%- set intermediate_relation = make_intermediate_relation(target_relation) -%}
+  {%- set preexisting_intermediate_relation = load_cached_relation(intermediate_relation) -%}
+  {%- set backup_relation_type = 'table' if existing_relation is none else existing_relation.type -%}
+  {%- set backup_relation = make_backup_relation(target_relation, backup_relation_type) -%}
+  {%- set preexisting_backup_relation = load_cached_relation(backup_relation) -%}
+
+  {{ drop_relation_if_exists(preexisting_intermediate_relation) }}
+  {{ drop_relation_if_exists(preexisting_backup_relation) }}
+
+  {{ run_hooks(pre_hooks, inside_transaction=False) }}
+  {{ run_hooks(pre_hooks, inside_transaction=True) }}
+
+  {%- set sorted_code -%}
+    {%- if sort_by -%}
+      select * from (
+        {{ compiled_code }}
+      ) as unsorted
+      order by {{ sort_by | join(', ') }}
+    {%- else -%}
+      {{ compiled_code }}
+    {%- endif -%}
+  {%- endset -%}
+
+  {% call statement('main') -%}
+    {{- create_table_as(False, intermediate_relation, sorted_code) }}
+  {%- endcall %}
+
+  {% if existing_relation is not none %}
+      {{ adapter.rename_relation(existing_relation, backup_relation) }}
+  {% endif %}
+
+  {{ adapter.rename_relation(intermediate_relation, target_relation) }}
+
+  {{ run_hooks(post_hooks, inside_transaction=True) }}
+
+  {% do persist_docs(target_relation, model) %}
+
+  {{ adapter.commit() }}
+
+  {{ drop_relation_if_exists(backup_relation) }}
+
+  {{ run_hooks(post_hooks, inside_transaction=False) }}
+
+  {{ return({'relations': [target_relation]}) }}
+{% endmaterialization %}
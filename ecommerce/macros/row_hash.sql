@@ -0,0 +1,13 @@
+{#
+    A 128-bit md5 of the given columns, persisted in snapshots so a changed
+    row is found by comparing one column. NULLs hash as '\N' and columns are
+    separated by '|' so that shifted or missing values give a different hash.
+#}
+{% macro row_hash(columns) %}
+    md5_number(
+        {%- for column in columns %}
+        coalesce(cast({{ column }} as varchar), '\N')
+        {%- if not loop.last %} || '|' ||{% endif %}
+        {%- endfor %}
+    )
+{% endmacro %}
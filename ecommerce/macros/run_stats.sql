@@ -0,0 +1,46 @@
+{#
+    Per-model DuckDB profiling, enabled with `--vars 'profile_models: true'`.
+    Every table built through create_table_as (table, sorted_table and the
+    temp table of an incremental run) is wrapped in DuckDB's JSON profiler,
+    and the profile of that one statement (latency, CPU time, rows scanned,
+    peak buffer memory, temp dir spill and the operator tree with per-operator
+    timings) is appended to `run_stats` keyed by invocation id and model name.
+    The profile is captured right after the build statement because DuckDB
+    overwrites the profile file with each later query, e.g. the delete+insert
+    of an incremental model. Views are not profiled, they run no query at
+    build time. See run_stats_report.py for a ranking across runs.
+#}
+
+{% macro create_run_stats() %}
+    {% if var('profile_models', false) %}
+    CREATE TABLE IF NOT EXISTS {{ target.schema }}.run_stats (
+        invocation_id VARCHAR,
+        model_name VARCHAR,
+        materialization VARCHAR,
+        captured_at TIMESTAMP,
+        profile JSON
+    )
+    {% endif %}
+{% endmacro %}
+
+{# Overrides dbt's global create_table_as, which only dispatches to duckdb__create_table_as #}
+{% macro create_table_as(temporary, relation, compiled_code, language='sql') -%}
+    {%- set build_sql = adapter.dispatch('create_table_as', 'dbt')(temporary, relation, compiled_code, language) -%}
+    {%- if language == 'sql' and var('profile_models', false) and model.resource_type == 'model' -%}
+        {%- set profile_path = var('profile_dir', 'target') ~ '/profile_' ~ model.name ~ '.json' -%}
+    PRAGMA enable_profiling='json';
+    SET profiling_output='{{ profile_path }}';
+    {{ build_sql }}
+    PRAGMA disable_profiling;
+    INSERT INTO {{ target.schema }}.run_stats
+    SELECT
+        '{{ invocation_id }}',
+        '{{ model.name }}',
+        '{{ config.get("materialized") }}',
+        now()::TIMESTAMP,
+        content::JSON
+    FROM read_text('{{ profile_path }}');
+    {%- else -%}
+    {{ build_sql }}
+    {%- endif -%}
+{%- endmacro %}
@@ -0,0 +1,98 @@
+{{ config(
+    materialized='table',
+    description='Precomputed daily, weekly and monthly sales rollups for dashboards.'
+) }}
+
+{#
+    One row per period and grouping set: the total, category, category and
+    brand, payment method, and dropoff location. grouping_id is the
+    GROUPING() bitmask over (product_category, product_brand, payment_method,
+    shipping_address_id), so a rolled-up column can be told apart from a NULL
+    value. Dashboards filter on period_type, grouping_id and period_start
+    instead of scanning fct_daily_sales.
+
+    The grouping sets are computed once per day; weeks and months are summed
+    from those daily rows, which are far fewer than the daily sales rows.
+    Counts are order lines (order x product), which add up across products;
+    an order with several items counts once per item. Dropoff locations are
+    grouped by id and named afterwards, so locations sharing a name keep
+    their own rows and ids without a location are labelled 'Unknown'.
+#}
+WITH daily_rollup AS (
+    SELECT
+        sales_date,
+        product_category,
+        product_brand,
+        payment_method,
+        shipping_address_id,
+        GROUPING(product_category, product_brand, payment_method, shipping_address_id) AS grouping_id,
+        CAST(SUM(num_order_lines) AS BIGINT) AS num_order_lines,
+        CAST(SUM(units_ordered) AS BIGINT) AS units_ordered,
+        CAST(SUM(ordered_amount) AS DECIMAL(18,2)) AS ordered_amount,
+        CAST(SUM(num_order_lines_delivered) AS BIGINT) AS num_order_lines_delivered,
+        CAST(SUM(units_sold) AS BIGINT) AS units_sold,
+        CAST(SUM(sales_amount) AS DECIMAL(18,2)) AS sales_amount,
+        CAST(SUM(cost_of_goods_sold) AS DECIMAL(18,2)) AS cost_of_goods_sold,
+        CAST(SUM(profit_amount) AS DECIMAL(18,2)) AS profit_amount
+    FROM {{ ref('fct_daily_sales') }}
+    GROUP BY
+        sales_date,
+        GROUPING SETS (
+            (),
+            (product_category),
+            (product_category, product_brand),
+            (payment_method),
+            (shipping_address_id)
+        )
+),
+
+periods AS (
+    SELECT 'day' AS period_type, sales_date AS period_start, * FROM daily_rollup
+    UNION ALL
+    SELECT 'week', date_trunc('week', sales_date)::DATE, * FROM daily_rollup
+    UNION ALL
+    SELECT 'month', date_trunc('month', sales_date)::DATE, * FROM daily_rollup
+),
+
+rollup AS (
+    SELECT
+        period_type,
+        period_start,
+        product_category,
+        product_brand,
+        payment_method,
+        shipping_address_id,
+        grouping_id,
+        CAST(SUM(num_order_lines) AS BIGINT) AS num_order_lines,
+        CAST(SUM(units_ordered) AS BIGINT) AS units_ordered,
+        CAST(SUM(ordered_amount) AS DECIMAL(18,2)) AS ordered_amount,
+        CAST(SUM(num_order_lines_delivered) AS BIGINT) AS num_order_lines_delivered,
+        CAST(SUM(units_sold) AS BIGINT) AS units_sold,
+        CAST(SUM(sales_amount) AS DECIMAL(18,2)) AS sales_amount,
+        CAST(SUM(cost_of_goods_sold) AS DECIMAL(18,2)) AS cost_of_goods_sold,
+        CAST(SUM(profit_amount) AS DECIMAL(18,2)) AS profit_amount
+    FROM periods
+    GROUP BY ALL
+)
+
+SELECT
+    r.period_type,
+    r.period_start,
+    r.product_category,
+    r.product_brand,
+    r.payment_method,
+    r.shipping_address_id,
+    -- Bit 0 is clear where the row is grouped by dropoff location
+    CASE WHEN r.grouping_id & 1 = 0 THEN COALESCE(dl.name, 'Unknown') END AS dropoff_location,
+    r.grouping_id,
+    r.num_order_lines,
+    r.units_ordered,
+    r.ordered_amount,
+    r.num_order_lines_delivered,
+    r.units_sold,
+    r.sales_amount,
+    r.cost_of_goods_sold,
+    r.profit_amount
+FROM rollup r
+LEFT JOIN {{ ref('stg__dropoff_locations') }} dl ON r.shipping_address_id = dl.id
+ORDER BY r.period_type, r.grouping_id, r.period_start
@@ -0,0 +1,27 @@
+{{ config(
+    materialized='table',
+    description='Every version of each customer from customers_snapshot, with its validity range.'
+) }}
+
+{#
+    Each version is valid from the end of the previous one, so ranges stay
+    contiguous even when a source updated_at lies ahead of the next change.
+    The first version is valid from the start of time, so orders placed
+    before the first snapshot still find a version in as-of joins.
+#}
+SELECT
+    customer_id AS customer_key,
+    first_name AS customer_first_name,
+    last_name AS customer_last_name,
+    email AS customer_email,
+    phone AS customer_phone,
+    gender AS customer_gender,
+    date_of_birth AS customer_date_of_birth,
+    COALESCE(
+        LAG(dbt_valid_to) OVER (PARTITION BY customer_id ORDER BY dbt_valid_to NULLS LAST),
+        TIMESTAMP '1900-01-01'
+    ) AS valid_from,
+    COALESCE(dbt_valid_to, TIMESTAMP '9999-12-31') AS valid_to,
+    dbt_valid_to IS NULL AS is_current
+FROM
+    {{ ref('customers_snapshot') }}
@@ -0,0 +1,27 @@
+{{ config(
+    materialized='table',
+    description='Every version of each product from products_snapshot, with its validity range.'
+) }}
+
+{#
+    Each version is valid from the end of the previous one; products has no
+    updated_at, so that is the snapshot that saw the change. The first
+    version is valid from the start of time, so orders placed before the
+    first snapshot still find a version in as-of joins.
+#}
+SELECT
+    product_id AS product_key,
+    name AS product_name,
+    category AS product_category,
+    subcategory AS product_subcategory,
+    brand AS product_brand,
+    price AS product_list_price,
+    cost AS product_cost,
+    COALESCE(
+        LAG(dbt_valid_to) OVER (PARTITION BY product_id ORDER BY dbt_valid_to NULLS LAST),
+        TIMESTAMP '1900-01-01'
+    ) AS valid_from,
+    COALESCE(dbt_valid_to, TIMESTAMP '9999-12-31') AS valid_to,
+    dbt_valid_to IS NULL AS is_current
+FROM
+    {{ ref('products_snapshot') }}
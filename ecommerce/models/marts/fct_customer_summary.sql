@@ -1,72 +1,88 @@
 {{ config(
-    materialized='table',
+    materialized='incremental',
+    unique_key='customer_key',
+    incremental_strategy='delete+insert',
     description='A fact table summarizing order and payment activities per customer.'
 ) }}
 
--- Aggregate delivered Order Items data
-WITH order_items_agg AS (
-    SELECT
-        o.customer_id AS customer_key,
-        SUM(oi.total_price) AS total_amount_spent,
-        COUNT(DISTINCT oi.order_item_id) AS total_items_purchased,
-        MIN(o.order_date) AS first_order_completed_at,
-        MAX(o.order_date) AS last_order_completed_at
-    FROM {{ ref('stg__orders') }} o
-    LEFT JOIN {{ ref('stg__order_items') }} oi ON o.order_id = oi.order_id
-    WHERE o.status = 'delivered'
-    GROUP BY o.customer_id
+{#
+    Incremental runs only recompute customers whose orders changed since the
+    newest orders.updated_at already summarized (minus the
+    `incremental_lookback_days` var), plus customers that are new in
+    dim_customers. Changes stamped older than that window, e.g. backfilled
+    historical batches, need a --full-refresh.
+#}
+WITH
+{% if is_incremental() %}
+-- Customers touched since the last run
+changed_customers AS (
+    SELECT DISTINCT customer_id AS customer_key
+    FROM {{ ref('int_orders_enriched') }}
+    WHERE updated_at > (
+        SELECT COALESCE(MAX(last_order_updated_at), TIMESTAMP '1900-01-01')
+        FROM {{ this }}
+    ) - INTERVAL ({{ var('incremental_lookback_days') }}) DAY
+
+    UNION
+
+    SELECT dc.customer_key
+    FROM {{ ref('dim_customers') }} dc
+    ANTI JOIN {{ this }} t ON dc.customer_key = t.customer_key
 ),
+{% endif %}
 
--- Aggregate all Orders data by status
+-- Aggregate orders, their items and payments in one pass; int_orders_enriched
+-- has one row per order, so plain counts replace COUNT(DISTINCT ...). Literals
+-- are cast to the columns' ENUM types so filters compare integer codes
+-- instead of casting every value to VARCHAR.
 orders_agg AS (
     SELECT
         customer_id AS customer_key,
-        COUNT(DISTINCT order_id) AS num_orders,
-        COUNT(DISTINCT CASE WHEN status = 'shipped' THEN order_id END) AS num_orders_shipped,
-        COUNT(DISTINCT CASE WHEN status = 'delivered' THEN order_id END) AS num_orders_delivered,
-        COUNT(DISTINCT CASE WHEN status = 'pending' THEN order_id END) AS num_orders_pending,
-        COUNT(DISTINCT CASE WHEN status = 'cancelled' THEN order_id END) AS num_orders_cancelled,
-        COUNT(DISTINCT CASE WHEN status = 'returned' THEN order_id END) AS num_orders_returned
-    FROM {{ ref('stg__orders') }}
+        SUM(items_total) FILTER (WHERE is_delivered) AS total_amount_spent,
+        SUM(num_items) FILTER (WHERE is_delivered) AS total_items_purchased,
+        MIN(order_date) FILTER (WHERE is_delivered) AS first_order_completed_at,
+        MAX(order_date) FILTER (WHERE is_delivered) AS last_order_completed_at,
+        COUNT(*) AS num_orders,
+        COUNT(*) FILTER (WHERE status = 'shipped'::order_status) AS num_orders_shipped,
+        COUNT(*) FILTER (WHERE is_delivered) AS num_orders_delivered,
+        COUNT(*) FILTER (WHERE status = 'pending'::order_status) AS num_orders_pending,
+        COUNT(*) FILTER (WHERE status = 'cancelled'::order_status) AS num_orders_cancelled,
+        COUNT(*) FILTER (WHERE status = 'returned'::order_status) AS num_orders_returned,
+        COUNT(payment_id) AS num_payments,
+        COUNT(*) FILTER (WHERE payment_method = 'eSewa'::payment_method) AS num_esewa_payments,
+        COUNT(*) FILTER (WHERE payment_method = 'Khalti'::payment_method) AS num_khalti_payments,
+        COUNT(*) FILTER (WHERE payment_method = 'Cash on Delivery'::payment_method) AS num_cod_payments,
+        COUNT(*) FILTER (WHERE payment_status = 'failed'::payment_status) AS num_failed_payments,
+        MAX(updated_at) AS last_order_updated_at
+    FROM {{ ref('int_orders_enriched') }}
+    {% if is_incremental() %}
+    WHERE customer_id IN (SELECT customer_key FROM changed_customers)
+    {% endif %}
     GROUP BY customer_id
-),
-
--- Aggregate Payments data
-payments_agg AS (
-    SELECT
-        o.customer_id AS customer_key,
-        COUNT(DISTINCT p.payment_id) AS num_payments,
-        COUNT(DISTINCT CASE WHEN p.payment_method = 'eSewa' THEN p.payment_id END) AS num_esewa_payments,
-        COUNT(DISTINCT CASE WHEN p.payment_method = 'Khalti' THEN p.payment_id END) AS num_khalti_payments,
-        COUNT(DISTINCT CASE WHEN p.payment_method = 'Cash on Delivery' THEN p.payment_id END) AS num_cod_payments,
-        COUNT(DISTINCT CASE WHEN p.status = 'failed' THEN p.payment_id END) AS num_failed_payments
-    FROM {{ ref('stg__orders') }} o
-    LEFT JOIN {{ ref('stg__payments') }} p ON o.order_id = p.order_id
-    GROUP BY o.customer_id
 )
 
 SELECT
-    dc.customer_key, 
-    COALESCE(oia.total_amount_spent, 0) AS total_amount_spent,
-    COALESCE(oia.total_items_purchased, 0) AS total_items_purchased,
-    oia.first_order_completed_at,
-    oia.last_order_completed_at,
+    dc.customer_key,
+    COALESCE(oa.total_amount_spent, 0) AS total_amount_spent,
+    COALESCE(oa.total_items_purchased, 0) AS total_items_purchased,
+    oa.first_order_completed_at,
+    oa.last_order_completed_at,
     COALESCE(oa.num_orders, 0) AS num_orders,
     COALESCE(oa.num_orders_shipped, 0) AS num_orders_shipped,
     COALESCE(oa.num_orders_delivered, 0) AS num_orders_delivered,
     COALESCE(oa.num_orders_pending, 0) AS num_orders_pending,
     COALESCE(oa.num_orders_cancelled, 0) AS num_orders_cancelled,
     COALESCE(oa.num_orders_returned, 0) AS num_orders_returned,
-    COALESCE(pa.num_payments, 0) AS num_payments,
-    COALESCE(pa.num_esewa_payments, 0) AS num_esewa_payments,
-    COALESCE(pa.num_khalti_payments, 0) AS num_khalti_payments,
-    COALESCE(pa.num_cod_payments, 0) AS num_cod_payments,
-    COALESCE(pa.num_failed_payments, 0) AS num_failed_payments
+    COALESCE(oa.num_payments, 0) AS num_payments,
+    COALESCE(oa.num_esewa_payments, 0) AS num_esewa_payments,
+    COALESCE(oa.num_khalti_payments, 0) AS num_khalti_payments,
+    COALESCE(oa.num_cod_payments, 0) AS num_cod_payments,
+    COALESCE(oa.num_failed_payments, 0) AS num_failed_payments,
+    oa.last_order_updated_at
 FROM
-    {{ ref('dim_customers') }} dc 
-LEFT JOIN
-    order_items_agg oia ON dc.customer_key = oia.customer_key
+    {{ ref('dim_customers') }} dc
 LEFT JOIN
     orders_agg oa ON dc.customer_key = oa.customer_key
-LEFT JOIN
-    payments_agg pa ON dc.customer_key = pa.customer_key
\ No newline at end of file
+{% if is_incremental() %}
+WHERE dc.customer_key IN (SELECT customer_key FROM changed_customers)
+{% endif %}
@@ -0,0 +1,158 @@
+{{ config(
+    materialized='table',
+    description='Catchment, order volume, sales and delivery distance per dropoff location.'
+) }}
+
+{#
+    Customers are matched to their nearest dropoff location with a grid join
+    instead of a cross join of customers and locations. Coordinates are
+    projected to kilometres as in dropoff_index.py, the plane is cut into
+    square cells of `dropoff_cell_km` (by default twice the spacing the
+    locations would have if spread evenly over their bounding box), and every
+    location is copied into its own cell and the eight around it. A customer
+    only meets the locations copied into its cell, and when the nearest of
+    them is within one cell size it is the nearest location overall; the few
+    customers farther out are compared with every location.
+
+    Order distances are to the location the order shipped to. Orders whose
+    shipping_address_id is not their customer's nearest location count as
+    misrouted; generate_data.py ships every order to the nearest one.
+#}
+WITH
+projection AS (
+    SELECT 111.320 * cos(radians(AVG(latitude::DOUBLE))) AS km_per_lon
+    FROM {{ ref('stg__dropoff_locations') }}
+),
+
+locations AS (
+    SELECT
+        d.id AS dropoff_id,
+        d.name AS dropoff_name,
+        d.latitude,
+        d.longitude,
+        d.longitude::DOUBLE * p.km_per_lon AS x,
+        d.latitude::DOUBLE * 110.574 AS y
+    FROM {{ ref('stg__dropoff_locations') }} d
+    CROSS JOIN projection p
+),
+
+grid AS (
+    SELECT
+        {%- if var('dropoff_cell_km', none) %}
+        {{ var('dropoff_cell_km') }}::DOUBLE AS cell_km
+        {%- else %}
+        GREATEST(
+            2 * sqrt((MAX(x) - MIN(x)) * (MAX(y) - MIN(y)) / COUNT(*)),
+            GREATEST(MAX(x) - MIN(x), MAX(y) - MIN(y)) / COUNT(*),
+            0.001
+        ) AS cell_km
+        {%- endif %}
+    FROM locations
+),
+
+-- Each location in its own cell and the eight neighbouring ones
+location_cells AS (
+    SELECT
+        l.dropoff_id,
+        l.x,
+        l.y,
+        floor(l.x / g.cell_km)::BIGINT + dx.range AS cell_x,
+        floor(l.y / g.cell_km)::BIGINT + dy.range AS cell_y
+    FROM locations l
+    CROSS JOIN grid g
+    CROSS JOIN range(-1, 2) dx
+    CROSS JOIN range(-1, 2) dy
+),
+
+customers AS (
+    SELECT
+        c.customer_id,
+        c.longitude::DOUBLE * p.km_per_lon AS x,
+        c.latitude::DOUBLE * 110.574 AS y,
+        floor(c.longitude::DOUBLE * p.km_per_lon / g.cell_km)::BIGINT AS cell_x,
+        floor(c.latitude::DOUBLE * 110.574 / g.cell_km)::BIGINT AS cell_y
+    FROM {{ ref('stg__customers') }} c
+    CROSS JOIN projection p
+    CROSS JOIN grid g
+),
+
+bucketed AS (
+    SELECT
+        c.customer_id,
+        arg_min(lc.dropoff_id, (c.x - lc.x) ** 2 + (c.y - lc.y) ** 2) AS dropoff_id,
+        sqrt(MIN((c.x - lc.x) ** 2 + (c.y - lc.y) ** 2)) AS distance_km
+    FROM customers c
+    JOIN location_cells lc ON lc.cell_x = c.cell_x AND lc.cell_y = c.cell_y
+    GROUP BY c.customer_id
+),
+
+exact AS (
+    SELECT b.*
+    FROM bucketed b
+    CROSS JOIN grid g
+    WHERE b.distance_km <= g.cell_km
+),
+
+customer_dropoffs AS (
+    SELECT c.customer_id, c.x, c.y, e.dropoff_id, e.distance_km
+    FROM customers c
+    JOIN exact e ON e.customer_id = c.customer_id
+
+    UNION ALL
+
+    SELECT
+        c.customer_id,
+        ANY_VALUE(c.x),
+        ANY_VALUE(c.y),
+        arg_min(l.dropoff_id, (c.x - l.x) ** 2 + (c.y - l.y) ** 2),
+        sqrt(MIN((c.x - l.x) ** 2 + (c.y - l.y) ** 2))
+    FROM customers c
+    ANTI JOIN exact e ON e.customer_id = c.customer_id
+    CROSS JOIN locations l
+    GROUP BY c.customer_id
+),
+
+catchment_agg AS (
+    SELECT
+        dropoff_id,
+        COUNT(*) AS num_customers,
+        AVG(distance_km) AS avg_customer_distance_km
+    FROM customer_dropoffs
+    GROUP BY dropoff_id
+),
+
+orders_agg AS (
+    SELECT
+        o.shipping_address_id AS dropoff_id,
+        COUNT(*) AS num_orders,
+        COUNT(*) FILTER (WHERE o.is_delivered) AS num_orders_delivered,
+        SUM(o.items_total) FILTER (WHERE o.is_delivered) AS total_sales,
+        AVG(sqrt((cd.x - l.x) ** 2 + (cd.y - l.y) ** 2)) AS avg_distance_km,
+        quantile_cont(sqrt((cd.x - l.x) ** 2 + (cd.y - l.y) ** 2), 0.5) AS p50_distance_km,
+        quantile_cont(sqrt((cd.x - l.x) ** 2 + (cd.y - l.y) ** 2), 0.95) AS p95_distance_km,
+        MAX(sqrt((cd.x - l.x) ** 2 + (cd.y - l.y) ** 2)) AS max_distance_km,
+        COUNT(*) FILTER (WHERE o.shipping_address_id <> cd.dropoff_id) AS num_misrouted_orders
+    FROM {{ ref('int_orders_enriched') }} o
+    JOIN locations l ON l.dropoff_id = o.shipping_address_id
+    LEFT JOIN customer_dropoffs cd ON cd.customer_id = o.customer_id
+    GROUP BY o.shipping_address_id
+)
+
+SELECT
+    l.dropoff_id AS dropoff_key,
+    l.dropoff_name,
+    l.latitude,
+    l.longitude,
+    COALESCE(ca.num_customers, 0) AS num_customers,
+    ROUND(ca.avg_customer_distance_km, 3) AS avg_customer_distance_km,
+    COALESCE(oa.num_orders, 0) AS num_orders,
+    COALESCE(oa.num_orders_delivered, 0) AS num_orders_delivered,
+    COALESCE(oa.total_sales, 0) AS total_sales,
+    ROUND(oa.avg_distance_km, 3) AS avg_distance_km,
+    ROUND(oa.p50_distance_km, 3) AS p50_distance_km,
+    ROUND(oa.p95_distance_km, 3) AS p95_distance_km,
+    ROUND(oa.max_distance_km, 3) AS max_distance_km,
+    COALESCE(oa.num_misrouted_orders, 0) AS num_misrouted_orders
+FROM locations l
+LEFT JOIN catchment_agg ca ON ca.dropoff_id = l.dropoff_id
+LEFT JOIN orders_agg oa ON oa.dropoff_id = l.dropoff_id
@@ -1,45 +1,71 @@
 {{ config(
-    materialized='table', 
+    materialized='incremental',
+    unique_key='product_key',
+    incremental_strategy='delete+insert',
     description='A fact table summarizing sales and cost metrics per product.'
 ) }}
 
--- Aggregate delivered Order Items data 
-WITH order_items_agg AS (
-    SELECT
-        oi.product_id AS product_key,
-        SUM(oi.total_price) AS sales_amount,
-        SUM(oi.quantity) AS total_units_sold,
-        COUNT(DISTINCT oi.order_id) AS num_orders,
-        AVG(oi.unit_price) AS avg_selling_price 
-    FROM {{ ref('stg__order_items') }} oi
-    LEFT JOIN {{ ref('stg__orders') }} o ON oi.order_id = o.order_id
-    WHERE o.status = 'delivered'
-    GROUP BY oi.product_id
+{#
+    Built on fct_order_items, so cost_of_goods_sold uses the product cost in
+    effect when each order was placed. Incremental runs only recompute
+    products that appear in orders updated since the newest
+    order_updated_at already summarized (minus the `incremental_lookback_days`
+    var), plus products new in dim_products or whose current cost changed.
+#}
+WITH
+{% if is_incremental() %}
+-- Products touched since the last run
+changed_products AS (
+    SELECT DISTINCT product_key
+    FROM {{ ref('fct_order_items') }}
+    WHERE order_updated_at > (
+        SELECT COALESCE(MAX(last_order_updated_at), TIMESTAMP '1900-01-01')
+        FROM {{ this }}
+    ) - INTERVAL ({{ var('incremental_lookback_days') }}) DAY
+
+    UNION
+
+    SELECT dp.product_key
+    FROM {{ ref('dim_products') }} dp
+    LEFT JOIN {{ this }} t ON dp.product_key = t.product_key
+    WHERE t.product_key IS NULL
+        OR t.product_cost_at_source IS DISTINCT FROM dp.product_cost_at_source
 ),
+{% endif %}
 
--- Cost of Goods Sold for delivered items
-cost_analysis_agg AS (
+-- Sales and point-in-time cost of goods sold for delivered items in one
+-- pass; products are distinct within an order, so COUNT(*) counts orders.
+-- The latest order change covers every status.
+order_items_agg AS (
     SELECT
-        oi.product_id AS product_key,
-        SUM(oi.quantity * p.cost) AS cost_of_goods_sold 
-    FROM {{ ref('stg__order_items') }} oi
-    LEFT JOIN {{ ref('stg__products') }} p ON oi.product_id = p.product_id
-    LEFT JOIN {{ ref('stg__orders') }} o ON oi.order_id = o.order_id
-    WHERE o.status = 'delivered'
-    GROUP BY oi.product_id
+        product_key,
+        SUM(total_price) FILTER (WHERE is_delivered) AS sales_amount,
+        SUM(quantity) FILTER (WHERE is_delivered) AS total_units_sold,
+        COUNT(*) FILTER (WHERE is_delivered) AS num_orders,
+        AVG(unit_price) FILTER (WHERE is_delivered) AS avg_selling_price,
+        SUM(cost_of_goods_sold) FILTER (WHERE is_delivered) AS cost_of_goods_sold,
+        MAX(order_updated_at) AS last_order_updated_at
+    FROM {{ ref('fct_order_items') }}
+    {% if is_incremental() %}
+    WHERE product_key IN (SELECT product_key FROM changed_products)
+    {% endif %}
+    GROUP BY product_key
 )
 
 SELECT
-    dp.product_key, 
+    dp.product_key,
     COALESCE(oia.sales_amount, 0) AS sales_amount,
     COALESCE(oia.total_units_sold, 0) AS total_units_sold,
     COALESCE(oia.num_orders, 0) AS num_orders,
-    oia.avg_selling_price, 
-    COALESCE(caa.cost_of_goods_sold, 0) AS cost_of_goods_sold,
-    (COALESCE(oia.sales_amount, 0) - COALESCE(caa.cost_of_goods_sold, 0)) AS profit_amount
+    oia.avg_selling_price,
+    COALESCE(oia.cost_of_goods_sold, 0) AS cost_of_goods_sold,
+    (COALESCE(oia.sales_amount, 0) - COALESCE(oia.cost_of_goods_sold, 0)) AS profit_amount,
+    dp.product_cost_at_source,
+    oia.last_order_updated_at
 FROM
-    {{ ref('dim_products') }} dp 
+    {{ ref('dim_products') }} dp
 LEFT JOIN
     order_items_agg oia ON dp.product_key = oia.product_key
-LEFT JOIN
-    cost_analysis_agg caa ON dp.product_key = caa.product_key
\ No newline at end of file
+{% if is_incremental() %}
+WHERE dp.product_key IN (SELECT product_key FROM changed_products)
+{% endif %}
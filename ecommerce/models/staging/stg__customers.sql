@@ -1,11 +1,15 @@
-SELECT 
-    customer_id,
-    first_name,
-    last_name,
-    email,
-    phone,
-    date_of_birth,
-    gender,
-    created_at,
-    updated_at 
-FROM {{source('ecommerce', 'customers')}}
\ No newline at end of file
+{{ config(sort_by='customer_id') }}
+
+SELECT
+    CAST(customer_id AS INTEGER) AS customer_id,
+    CAST(first_name AS VARCHAR) AS first_name,
+    CAST(last_name AS VARCHAR) AS last_name,
+    CAST(email AS VARCHAR) AS email,
+    CAST(phone AS VARCHAR) AS phone,
+    CAST(date_of_birth AS DATE) AS date_of_birth,
+    CAST(gender AS customer_gender) AS gender,
+    CAST(latitude AS DECIMAL(9,6)) AS latitude,
+    CAST(longitude AS DECIMAL(9,6)) AS longitude,
+    CAST(created_at AS TIMESTAMP) AS created_at,
+    CAST(updated_at AS TIMESTAMP) AS updated_at
+FROM {{ ecommerce_source('customers') }}
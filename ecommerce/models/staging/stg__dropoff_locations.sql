@@ -1,3 +1,5 @@
+{{ config(materialized='view') }}
+
 SELECT 
     id,
     name,
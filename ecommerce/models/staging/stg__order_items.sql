@@ -1,9 +1,15 @@
-SELECT 
-    order_item_id,
-    order_id,
-    product_id,
-    quantity,
-    unit_price,
-    total_price,
-    discount_amount
-FROM {{source('ecommerce', 'order_items')}}
\ No newline at end of file
+{{ config(sort_by=['order_month', 'order_id', 'product_id']) }}
+
+SELECT
+    CAST(oi.order_item_id AS INTEGER) AS order_item_id,
+    CAST(oi.order_id AS INTEGER) AS order_id,
+    CAST(oi.product_id AS INTEGER) AS product_id,
+    CAST(oi.quantity AS INTEGER) AS quantity,
+    CAST(oi.unit_price AS DECIMAL(10,2)) AS unit_price,
+    CAST(oi.total_price AS DECIMAL(10,2)) AS total_price,
+    CAST(oi.discount_amount AS DECIMAL(10,2)) AS discount_amount,
+    {{ ecommerce_order_month('oi', 'o.order_date') }} AS order_month
+FROM {{ ecommerce_source('order_items') }} oi
+{%- if not ecommerce_source_is_parquet() %}
+LEFT JOIN {{ ecommerce_source('orders') }} o ON o.order_id = oi.order_id
+{%- endif %}
@@ -1,12 +1,15 @@
-SELECT 
-    order_id,
-    customer_id,
-    order_date,
-    status,
-    total_amount,
-    shipping_cost,
-    discount_amount,
-    shipping_address_id,
-    created_at,
-    updated_at
-FROM {{source('ecommerce', 'orders')}}
\ No newline at end of file
+{{ config(sort_by=['order_date', 'order_id']) }}
+
+SELECT
+    CAST(order_id AS INTEGER) AS order_id,
+    CAST(customer_id AS INTEGER) AS customer_id,
+    CAST(order_date AS TIMESTAMP) AS order_date,
+    {{ ecommerce_order_month('o', 'order_date') }} AS order_month,
+    CAST(status AS order_status) AS status,
+    CAST(total_amount AS DECIMAL(10,2)) AS total_amount,
+    CAST(shipping_cost AS DECIMAL(10,2)) AS shipping_cost,
+    CAST(discount_amount AS DECIMAL(10,2)) AS discount_amount,
+    CAST(shipping_address_id AS INTEGER) AS shipping_address_id,
+    CAST(created_at AS TIMESTAMP) AS created_at,
+    CAST(updated_at AS TIMESTAMP) AS updated_at
+FROM {{ ecommerce_source('orders') }} o
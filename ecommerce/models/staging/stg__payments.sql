@@ -1,9 +1,15 @@
-SELECT 
-    payment_id,
-    order_id,
-    payment_method,
-    amount,
-    payment_date,
-    status,
-    transaction_id
-FROM {{source('ecommerce', 'payments')}}
\ No newline at end of file
+{{ config(sort_by=['order_month', 'order_id']) }}
+
+SELECT
+    CAST(p.payment_id AS INTEGER) AS payment_id,
+    CAST(p.order_id AS INTEGER) AS order_id,
+    CAST(p.payment_method AS payment_method) AS payment_method,
+    CAST(p.amount AS DECIMAL(10,2)) AS amount,
+    CAST(p.payment_date AS TIMESTAMP) AS payment_date,
+    CAST(p.status AS payment_status) AS status,
+    CAST(p.transaction_id AS VARCHAR) AS transaction_id,
+    {{ ecommerce_order_month('p', 'o.order_date') }} AS order_month
+FROM {{ ecommerce_source('payments') }} p
+{%- if not ecommerce_source_is_parquet() %}
+LEFT JOIN {{ ecommerce_source('orders') }} o ON o.order_id = p.order_id
+{%- endif %}
@@ -1,11 +1,13 @@
-SELECT 
-    product_id,
-    name,
-    category,
-    subcategory,
-    brand,
-    price,
-    cost,
-    weight_kg,
-    created_at
-FROM {{ source('ecommerce', 'products') }}
\ No newline at end of file
+{{ config(sort_by='product_id') }}
+
+SELECT
+    CAST(product_id AS INTEGER) AS product_id,
+    CAST(name AS VARCHAR) AS name,
+    CAST(category AS product_category) AS category,
+    CAST(subcategory AS product_subcategory) AS subcategory,
+    CAST(brand AS product_brand) AS brand,
+    CAST(price AS DECIMAL(10,2)) AS price,
+    CAST(cost AS DECIMAL(10,2)) AS cost,
+    CAST(weight_kg AS DECIMAL(5,2)) AS weight_kg,
+    CAST(created_at AS TIMESTAMP) AS created_at
+FROM {{ ecommerce_source('products') }}
@@ -0,0 +1,131 @@
+import argparse
+
+import numpy as np
+from dbt.cli.main import dbtRunner
+
+from SCD2_data_generator import SCD2DataGenerator
+
+# Node results that count as model time; hooks and everything dbt does
+# around the nodes count as overhead
+MODEL_RESOURCE_TYPES = {'model', 'snapshot'}
+
+class Orchestrator:
+    """Runs SCD2 batch -> dbt snapshot -> dbt run cycles in one process.
+
+    The dbt project is parsed once and every invocation reuses that manifest,
+    and the SCD2DataGenerator keeps its connection open throughout; dbt-duckdb
+    shares the same in-process DuckDB database. Per cycle it records the batch
+    time, the time dbt spent executing snapshot and model nodes, and the
+    overhead around them (the rest of each invocation's wall time, assuming a
+    single dbt thread).
+    """
+
+    def __init__(self, generator, project_dir='.', profiles_dir='.', snapshot_select=None, run_select=None,
+                 dbt_vars=None):
+        self.generator = generator
+        self.stats = generator.stats
+        self.common_args = ['--project-dir', project_dir, '--profiles-dir', profiles_dir, '--quiet']
+        if dbt_vars:
+            self.common_args += ['--vars', dbt_vars]
+        self.snapshot_select = snapshot_select
+        self.run_select = run_select
+        self.cycles = []
+
+        with self.stats.stage('dbt_parse'):
+            result = dbtRunner().invoke(['parse'] + self.common_args)
+        if not result.success:
+            raise RuntimeError(f"dbt parse failed: {result.exception}")
+        self.parse_s = self.stats.records[-1]['wall_s']
+        self.runner = dbtRunner(manifest=result.result)
+
+    def invoke(self, command, select=None):
+        """Run a dbt command on the parsed manifest; returns (wall, model node time)"""
+        args = [command] + self.common_args
+        if select:
+            args += ['--select', select]
+        with self.stats.stage(f'dbt_{command}') as record:
+            result = self.runner.invoke(args)
+        nodes = result.result.results if result.result is not None else []
+        if not result.success:
+            failed = [r.node.name for r in nodes if r.status in ('error', 'fail')]
+            raise RuntimeError(f"dbt {command} failed: {result.exception or ', '.join(failed)}")
+        model_s = sum(r.execution_time for r in nodes if r.node.resource_type in MODEL_RESOURCE_TYPES)
+        return record['wall_s'], model_s
+
+    def run_cycle(self):
+        """Generate one SCD2 batch, then snapshot and run the models"""
+        with self.stats.stage('cycle') as cycle_record:
+            with self.stats.stage('generate_batch') as record:
+                record['rows'] = self.generator.generate_incremental_batch()
+            snapshot_s, snapshot_model_s = self.invoke('snapshot', self.snapshot_select)
+            run_s, run_model_s = self.invoke('run', self.run_select)
+        cycle = {
+            'cycle': len(self.cycles) + 1,
+            'changes': record['rows'],
+            'generate_s': record['wall_s'],
+            'snapshot_s': snapshot_model_s,
+            'run_s': run_model_s,
+            'overhead_s': (snapshot_s - snapshot_model_s) + (run_s - run_model_s),
+            'cycle_s': cycle_record['wall_s'],
+            'peak_rss_mb': cycle_record['peak_rss_mb']
+        }
+        self.cycles.append(cycle)
+        return cycle
+
+    def run(self, num_cycles):
+        for _ in range(num_cycles):
+            cycle = self.run_cycle()
+            print(f"Cycle {cycle['cycle']}: {cycle['changes']:,} changes, generate {cycle['generate_s']:.2f}s, "
+                  f"snapshot {cycle['snapshot_s']:.2f}s, run {cycle['run_s']:.2f}s, "
+                  f"overhead {cycle['overhead_s']:.2f}s, total {cycle['cycle_s']:.2f}s, "
+                  f"peak {cycle['peak_rss_mb']:,.0f} MB")
+
+    def print_report(self):
+        print(f"\n=== Orchestrator Report ({len(self.cycles)} cycles, dbt parsed once in {self.parse_s:.2f}s) ===")
+        if not self.cycles:
+            return
+        header = f"{'per cycle':<12} {'mean s':>8} {'p50 s':>8} {'p95 s':>8} {'max s':>8} {'share':>7}"
+        print(header)
+        print('-' * len(header))
+        total = sum(cycle['cycle_s'] for cycle in self.cycles)
+        for column in ['generate_s', 'snapshot_s', 'run_s', 'overhead_s', 'cycle_s']:
+            seconds = np.array([cycle[column] for cycle in self.cycles])
+            p50, p95 = np.percentile(seconds, [50, 95])
+            print(f"{column[:-2]:<12} {seconds.mean():>8.3f} {p50:>8.3f} {p95:>8.3f} {seconds.max():>8.3f} "
+                  f"{seconds.sum() / total:>7.1%}")
+        # Drift between the first and last cycles shows up in long soak runs
+        if len(self.cycles) >= 4:
+            quarter = len(self.cycles) // 4
+            first, last = self.cycles[:quarter], self.cycles[-quarter:]
+            for column in ['cycle_s', 'peak_rss_mb']:
+                before = sum(cycle[column] for cycle in first) / quarter
+                after = sum(cycle[column] for cycle in last) / quarter
+                print(f"{column}: first quarter {before:,.2f}, last quarter {after:,.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run SCD2 batch -> dbt snapshot -> dbt run cycles in one warm process")
+    parser.add_argument('--cycles', type=int, default=10)
+    parser.add_argument('--db-path', default='nepal_ecommerce.duckdb',
+                        help="Database the batches are written to; must be the one of the dbt target")
+    parser.add_argument('--project-dir', default='.')
+    parser.add_argument('--profiles-dir', default='.')
+    parser.add_argument('--snapshot-select', default=None,
+                        help="dbt selection for the snapshot step (default all snapshots)")
+    parser.add_argument('--select', default=None, help="dbt selection for the run step (default all models)")
+    parser.add_argument('--vars', default=None, help="dbt --vars for every invocation")
+    parser.add_argument('--no-change-log', action='store_true', help="Do not record changes in change_log")
+    args = parser.parse_args()
+
+    generator = SCD2DataGenerator(args.db_path, log_changes=not args.no_change_log)
+    orchestrator = Orchestrator(generator, project_dir=args.project_dir, profiles_dir=args.profiles_dir,
+                                snapshot_select=args.snapshot_select, run_select=args.select, dbt_vars=args.vars)
+    try:
+        orchestrator.run(args.cycles)
+    finally:
+        orchestrator.print_report()
+        generator.print_stage_stats()
+        generator.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import generate_data as gd
+from SCD2_data_generator import CDC_ENTITIES, ORDER_STATUS_TRANSITIONS, SCD2DataGenerator
+
+# The producer wakes up this often and stamps every event that fell due since
+# its last wake-up with the current time
+TICK_SECONDS = 0.01
+
+STATUS_CODES = {status: code for code, status in enumerate(gd.ORDER_STATUSES)}
+TRANSITIONAL_CODES = [STATUS_CODES[status] for status in ORDER_STATUS_TRANSITIONS]
+
+class OrderStream:
+    """Continuous stream of new orders and order status transitions.
+
+    An asyncio producer emits events at `rate` per second; a new order event
+    becomes an order with its items and payment, a status event moves one
+    streamed order that is still in a transitional state to its next status.
+    Every `flush_interval` seconds the events so far are built into rows and
+    written as one micro-batch, either in a single DuckDB transaction (with
+    change log entries for every inserted order, item and payment and every
+    status change, so replay_change_log rebuilds the stream) or as Parquet
+    files under output_dir/<table>/. The latency of an event runs from its
+    creation to the end of that write.
+    """
+
+    def __init__(self, generator, rate=100, flush_interval=1.0, status_share=0.3, sink='duckdb',
+                 output_dir='stream', seed=None, customer_skew=0.0, product_skew=0.0):
+        self.generator = generator
+        self.conn = generator.conn
+        self.rate = rate
+        self.flush_interval = flush_interval
+        self.status_share = status_share
+        self.sink = sink
+        self.output_dir = output_dir
+        self.customer_skew = customer_skew
+        self.product_skew = product_skew
+        self.rng = np.random.default_rng(seed)
+
+        self.customer_count = generator.get_table_max_id('customers', 'customer_id')
+        # Orders ship to their customer's nearest dropoff location
+        self.customer_dropoffs = gd.nearest_customer_dropoffs(self.conn, generator.dropoffs, generator.stats)
+        # Product ids are dense from 1, so a product's price sits at index id - 1
+        self.product_prices = self.conn.execute(
+            "SELECT price::DOUBLE AS price FROM products ORDER BY product_id"
+        ).fetchnumpy()['price']
+        self.first_order_id = generator.get_table_max_id('orders', 'order_id') + 1
+        self.next_order_id = self.first_order_id
+        self.next_item_id = generator.get_table_max_id('order_items', 'order_item_id') + 1
+        # Current status code of each streamed order, at index order_id - first_order_id
+        self.statuses = np.empty(0, dtype=np.int8)
+
+        self.pending = []  # (created_at, new orders, status events) per producer tick
+        self.latencies = []  # (seconds, events) per tick once visible
+        self.counts = {'events': 0, 'orders': 0, 'order_items': 0, 'payments': 0,
+                       'status_changes': 0, 'skipped_status_events': 0, 'flushes': 0}
+        if sink == 'parquet':
+            for table in ['orders', 'order_items', 'payments', 'order_status_changes']:
+                os.makedirs(os.path.join(output_dir, table), exist_ok=True)
+
+    async def produce(self, duration):
+        """Emit events at the configured rate for duration seconds"""
+        start = time.time()
+        emitted = 0
+        while (now := time.time()) - start < duration:
+            due = int((now - start) * self.rate) - emitted
+            if due:
+                status_events = int(self.rng.binomial(due, self.status_share))
+                self.pending.append((now, due - status_events, status_events))
+                emitted += due
+            await asyncio.sleep(TICK_SECONDS)
+        self.counts['events'] = emitted
+
+    async def run(self, duration):
+        """Stream for duration seconds, flushing a micro-batch every flush_interval"""
+        start = time.time()
+        producer = asyncio.create_task(self.produce(duration))
+        while not producer.done():
+            await asyncio.wait({producer}, timeout=self.flush_interval)
+            await self.flush()
+        await self.flush()
+        self.elapsed = time.time() - start
+
+    async def flush(self):
+        """Write the events emitted since the last flush; runs in a thread so the producer keeps going"""
+        ticks, self.pending = self.pending, []
+        if not ticks:
+            return
+        visible_at = await asyncio.to_thread(self._ingest, ticks)
+        for created_at, new_orders, status_events in ticks:
+            self.latencies.append((visible_at - created_at, new_orders + status_events))
+        self.counts['flushes'] += 1
+
+    def _build_batch(self, ticks):
+        """Build the rows of a micro-batch in bulk"""
+        tick_times = np.array([datetime.fromtimestamp(created_at) for created_at, _, _ in ticks], dtype='datetime64[us]')
+        order_time = np.repeat(tick_times, [new_orders for _, new_orders, _ in ticks])
+        status_time = np.repeat(tick_times, [status_events for _, _, status_events in ticks])
+        n = len(order_time)
+
+        orders = gd.generate_orders(n, self.customer_count, rng=self.rng, start_id=self.next_order_id,
+                                    customer_skew=self.customer_skew, customer_dropoffs=self.customer_dropoffs)
+        orders['order_date'] = orders['created_at'] = orders['updated_at'] = order_time
+        orders['status'] = 'pending'
+        order_items = gd.generate_order_items(orders, self.product_prices, rng=self.rng, start_id=self.next_item_id,
+                                              product_skew=self.product_skew)
+        payments = gd.generate_payments(orders, rng=self.rng)
+        payments['payment_date'] = order_time
+        self.next_order_id += n
+        self.next_item_id += len(order_items)
+
+        # Each status event moves a distinct streamed order one step on. New
+        # orders of this batch become eligible from their own tick, so an
+        # order is never updated before it was created; events beyond the
+        # orders in transit at their tick are skipped
+        self.statuses = np.concatenate([self.statuses, np.full(n, STATUS_CODES['pending'], dtype=np.int8)])
+        candidates = np.flatnonzero(np.isin(self.statuses, TRANSITIONAL_CODES))
+        available = np.ones(len(candidates), dtype=bool)
+        created_before = len(self.statuses) - n + np.cumsum([new_orders for _, new_orders, _ in ticks])
+        picked, event_time = [], []
+        for tick_time, bound, (_, _, status_events) in zip(tick_times, created_before, ticks):
+            if not status_events:
+                continue
+            pool = np.flatnonzero(available[:np.searchsorted(candidates, bound)])
+            chosen = self.rng.choice(pool, size=min(status_events, len(pool)), replace=False)
+            available[chosen] = False
+            picked.append(candidates[chosen])
+            event_time.append(np.full(len(chosen), tick_time))
+        picked = np.concatenate(picked) if picked else np.empty(0, dtype=np.int64)
+        event_time = np.concatenate(event_time) if event_time else np.empty(0, dtype='datetime64[us]')
+        new_status = np.empty(len(picked), dtype=np.int8)
+        for status, (_, next_statuses) in ORDER_STATUS_TRANSITIONS.items():
+            mask = self.statuses[picked] == STATUS_CODES[status]
+            new_status[mask] = self.rng.choice([STATUS_CODES[s] for s in next_statuses], size=int(mask.sum()))
+        self.statuses[picked] = new_status
+        status_changes = pd.DataFrame({
+            'order_id': self.first_order_id + picked,
+            'status': np.asarray(gd.ORDER_STATUSES)[new_status],
+            'updated_at': event_time
+        })
+        self.counts['skipped_status_events'] += len(status_time) - len(picked)
+
+        return {'orders': orders, 'order_items': order_items, 'payments': payments,
+                'order_status_changes': status_changes}
+
+    def _ingest(self, ticks):
+        """Build and write one micro-batch, returning when it became visible"""
+        stats = self.generator.stats
+        with stats.stage('stream_build') as record:
+            batch = self._build_batch(ticks)
+            record['rows'] = sum(len(df) for df in batch.values())
+        with stats.stage(f'stream_write_{self.sink}') as record:
+            if self.sink == 'parquet':
+                self._write_parquet(batch)
+            else:
+                self._write_duckdb(batch)
+            record['rows'] = sum(len(df) for df in batch.values())
+        for table in ['orders', 'order_items', 'payments']:
+            self.counts[table] += len(batch[table])
+        self.counts['status_changes'] += len(batch['order_status_changes'])
+        return time.time()
+
+    def _write_duckdb(self, batch):
+        """Apply a micro-batch in one transaction"""
+        batch_timestamp = datetime.now()
+        generator = self.generator
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            # A flush can hold status events only, with no rows to insert
+            for table in ['orders', 'order_items', 'payments']:
+                df = batch[table]
+                if not len(df):
+                    continue
+                self.conn.execute(f"INSERT INTO {table} SELECT * FROM df")
+                key = CDC_ENTITIES[table]
+                generator._log_inserts(table, batch_timestamp, int(df[key].min()) - 1)
+
+            status_changes = batch['order_status_changes']
+            if len(status_changes):
+                self.conn.execute("CREATE OR REPLACE TEMP TABLE stream_status_updates AS SELECT * FROM status_changes")
+                generator._capture_before('orders', 'stream_status_updates')
+                self.conn.execute("""
+                    UPDATE orders
+                    SET status = u.status,
+                        updated_at = u.updated_at
+                    FROM stream_status_updates u
+                    WHERE orders.order_id = u.order_id
+                """)
+                generator._log_updates('orders', batch_timestamp)
+                self.conn.execute("DROP TABLE stream_status_updates")
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def _write_parquet(self, batch):
+        """Write a micro-batch as one Parquet file per table, each renamed into place once complete"""
+        name = f"batch_{self.counts['flushes']:06d}_{self.next_order_id - 1}.parquet"
+        for table, df in batch.items():
+            if not len(df):
+                continue
+            path = os.path.join(self.output_dir, table, name)
+            self.conn.execute(f"COPY (SELECT * FROM df) TO '{path}.tmp' (FORMAT parquet)")
+            os.replace(path + '.tmp', path)
+
+    def print_report(self):
+        events = sum(n for _, n in self.latencies)
+        print(f"\n=== Stream Report ({self.sink}) ===")
+        print(f"Events: {self.counts['events']:,} emitted, {events:,} visible in {self.elapsed:.2f}s "
+              f"({events / self.elapsed:,.0f} events/s, target {self.rate:,.0f})")
+        print(f"Rows: {self.counts['orders']:,} orders, {self.counts['order_items']:,} order items, "
+              f"{self.counts['payments']:,} payments, {self.counts['status_changes']:,} status changes "
+              f"in {self.counts['flushes']} flushes")
+        if self.counts['skipped_status_events']:
+            print(f"Skipped status events (no streamed order in transit): {self.counts['skipped_status_events']:,}")
+        if events:
+            seconds = np.repeat([s for s, _ in self.latencies], [n for _, n in self.latencies])
+            p50, p95, p99 = np.percentile(seconds, [50, 95, 99]) * 1000
+            print(f"Latency to visibility: p50 {p50:,.0f} ms, p95 {p95:,.0f} ms, p99 {p99:,.0f} ms, "
+                  f"max {seconds.max() * 1000:,.0f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream orders and status changes into the e-commerce database")
+    parser.add_argument('--db-path', default='nepal_ecommerce.duckdb')
+    parser.add_argument('--rate', type=float, default=100, help="Events per second")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds to stream for")
+    parser.add_argument('--flush-interval', type=float, default=1.0, help="Seconds between micro-batches")
+    parser.add_argument('--status-share', type=float, default=0.3,
+                        help="Share of events that are status transitions rather than new orders")
+    parser.add_argument('--sink', choices=['duckdb', 'parquet'], default='duckdb')
+    parser.add_argument('--output-dir', default='stream', help="Directory for the Parquet sink")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--customer-skew', type=float, default=0.0, help="See generate_data.py --customer-skew")
+    parser.add_argument('--product-skew', type=float, default=0.0, help="See generate_data.py --product-skew")
+    parser.add_argument('--no-change-log', action='store_true', help="Do not record changes in change_log")
+    args = parser.parse_args()
+
+    generator = SCD2DataGenerator(args.db_path, log_changes=not args.no_change_log)
+    stream = OrderStream(generator, rate=args.rate, flush_interval=args.flush_interval,
+                         status_share=args.status_share, sink=args.sink, output_dir=args.output_dir,
+                         seed=args.seed, customer_skew=args.customer_skew, product_skew=args.product_skew)
+    print(f"Streaming {args.rate:g} events/s for {args.duration:g}s into {args.sink}, "
+          f"flushing every {args.flush_interval:g}s...")
+    asyncio.run(stream.run(args.duration))
+    stream.print_report()
+    generator.print_stage_stats()
+    generator.close()
+
+if __name__ == "__main__":
+    main()
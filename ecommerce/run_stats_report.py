@@ -0,0 +1,101 @@
+import argparse
+import json
+
+import duckdb
+
+DEFAULT_DB_PATH = 'nepal_ecommerce.duckdb'
+
+MODEL_STATS_SQL = """
+    WITH builds AS (
+        SELECT
+            model_name,
+            invocation_id,
+            captured_at,
+            (profile->>'latency')::DOUBLE AS latency,
+            (profile->>'cpu_time')::DOUBLE AS cpu_time,
+            (profile->>'cumulative_rows_scanned')::BIGINT AS rows_scanned,
+            (profile->>'system_peak_buffer_memory')::BIGINT AS peak_memory,
+            (profile->>'system_peak_temp_dir_size')::BIGINT AS spilled
+        FROM run_stats
+        WHERE invocation_id IN (SELECT invocation_id FROM recent_runs)
+    )
+    SELECT
+        model_name,
+        COUNT(*) AS builds,
+        AVG(latency) AS avg_s,
+        MAX(latency) AS max_s,
+        ARG_MAX(latency, captured_at) AS last_s,
+        AVG(cpu_time) AS avg_cpu_s,
+        AVG(rows_scanned)::BIGINT AS avg_rows_scanned,
+        MAX(peak_memory) AS peak_memory,
+        MAX(spilled) AS spilled
+    FROM builds
+    GROUP BY model_name
+    ORDER BY avg_s DESC
+"""
+
+def _operators(node):
+    """Yield (operator, seconds, rows) for every operator in a profile tree"""
+    for child in node.get('children', []):
+        if 'operator_type' in child:
+            yield child['operator_type'], child.get('operator_timing', 0.0), child.get('operator_cardinality', 0)
+        yield from _operators(child)
+
+def operator_stats(conn):
+    """Total operator time per model and operator type across the selected runs"""
+    totals = {}
+    rows = conn.execute(
+        "SELECT model_name, profile FROM run_stats WHERE invocation_id IN (SELECT invocation_id FROM recent_runs)"
+    ).fetchall()
+    for model_name, profile in rows:
+        for operator, seconds, cardinality in _operators(json.loads(profile)):
+            stat = totals.setdefault((model_name, operator), {'seconds': 0.0, 'rows': 0})
+            stat['seconds'] += seconds
+            stat['rows'] += cardinality
+    return sorted(totals.items(), key=lambda item: item[1]['seconds'], reverse=True)
+
+def print_report(conn, limit):
+    runs = conn.execute("SELECT COUNT(*) FROM recent_runs").fetchone()[0]
+    print(f"Model builds across {runs} run(s), slowest first")
+    header = (f"{'model':<24} {'builds':>6} {'avg s':>8} {'max s':>8} {'last s':>8} {'cpu s':>8} "
+              f"{'rows scanned':>14} {'peak MB':>9} {'spill MB':>9}")
+    print(header)
+    print('-' * len(header))
+    for (model_name, builds, avg_s, max_s, last_s, cpu_s, rows_scanned,
+         peak_memory, spilled) in conn.execute(MODEL_STATS_SQL).fetchall()[:limit]:
+        print(f"{model_name:<24} {builds:>6} {avg_s:>8.3f} {max_s:>8.3f} {last_s:>8.3f} {cpu_s:>8.3f} "
+              f"{rows_scanned:>14,} {peak_memory / 2**20:>9.1f} {spilled / 2**20:>9.1f}")
+
+    print(f"\nOperators by total time across {runs} run(s)")
+    header = f"{'model':<24} {'operator':<28} {'total s':>9} {'rows':>14}"
+    print(header)
+    print('-' * len(header))
+    for (model_name, operator), stat in operator_stats(conn)[:limit]:
+        print(f"{model_name:<24} {operator:<28} {stat['seconds']:>9.3f} {stat['rows']:>14,}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rank models and operators by cost from the run_stats profiles of `dbt run --vars 'profile_models: true'`")
+    parser.add_argument('--db-path', default=DEFAULT_DB_PATH)
+    parser.add_argument('--runs', type=int, default=10, help="Only include the last N dbt invocations")
+    parser.add_argument('--limit', type=int, default=20, help="Rows per section")
+    args = parser.parse_args()
+
+    conn = duckdb.connect(args.db_path, read_only=True)
+    tables = conn.execute("SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'run_stats'").fetchone()[0]
+    if not tables:
+        print(f"No run_stats table in '{args.db_path}'; run `dbt run --vars 'profile_models: true'` first")
+        return
+    conn.execute(f"""
+        CREATE TEMP VIEW recent_runs AS
+        SELECT invocation_id
+        FROM run_stats
+        GROUP BY invocation_id
+        ORDER BY MIN(captured_at) DESC
+        LIMIT {args.runs}
+    """)
+    print_report(conn, args.limit)
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,8 @@
     config(
     target_schema='main',
     unique_key='customer_id',
-    strategy='timestamp',
+    strategy='check',
+    check_cols=['row_hash'],
     updated_at='updated_at'
     ) 
 }}
@@ -16,11 +17,11 @@ SELECT
     email,
     phone,
     date_of_birth,
-    gender,
+    -- ENUM as in the source tables, also when reading the Parquet export
+    CAST(gender AS customer_gender) AS gender,
     created_at,
-    updated_at 
-FROM {{source('ecommerce', 'customers')}}
+    updated_at,
+    {{ row_hash(['first_name', 'last_name', 'email', 'phone', 'date_of_birth', 'gender']) }} AS row_hash
+FROM {{ ecommerce_source('customers') }}
 
 {% endsnapshot %}
-
-
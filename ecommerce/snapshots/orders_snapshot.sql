@@ -0,0 +1,28 @@
+{% snapshot orders_snapshot %}
+
+{{ 
+    config(
+    target_schema='main',
+    unique_key='order_id',
+    strategy='check',
+    check_cols=['row_hash'],
+    updated_at='updated_at'
+    ) 
+}}
+
+SELECT
+    order_id,
+    customer_id,
+    order_date,
+    -- ENUM as in the source tables, also when reading the Parquet export
+    CAST(status AS order_status) AS status,
+    total_amount,
+    shipping_cost,
+    discount_amount,
+    shipping_address_id,
+    created_at,
+    updated_at,
+    {{ row_hash(['customer_id', 'order_date', 'status', 'total_amount', 'shipping_cost', 'discount_amount', 'shipping_address_id']) }} AS row_hash
+FROM {{ ecommerce_source('orders') }}
+
+{% endsnapshot %}
@@ -0,0 +1,27 @@
+{% snapshot products_snapshot %}
+
+{{ 
+    config(
+    target_schema='main',
+    unique_key='product_id',
+    strategy='check',
+    check_cols=['row_hash']
+    ) 
+}}
+
+-- products has no updated_at; versions are stamped with the snapshot time
+SELECT
+    product_id,
+    name,
+    -- ENUMs as in the source tables, also when reading the Parquet export
+    CAST(category AS product_category) AS category,
+    CAST(subcategory AS product_subcategory) AS subcategory,
+    CAST(brand AS product_brand) AS brand,
+    price,
+    cost,
+    weight_kg,
+    created_at,
+    {{ row_hash(['name', 'category', 'subcategory', 'brand', 'price', 'cost', 'weight_kg']) }} AS row_hash
+FROM {{ ecommerce_source('products') }}
+
+{% endsnapshot %}
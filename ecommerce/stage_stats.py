@@ -0,0 +1,139 @@
+"""Stage-level timing and memory instrumentation for the data generators.
+
+A StageStats collects one record per stage call with its wall time, CPU time,
+rows produced and peak RSS. Records are appended to a JSON lines file and/or a
+DuckDB table, so runs can be compared over time and a single run can be broken
+down by where it spent its time.
+"""
+import json
+import resource
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+DEFAULT_STATS_TABLE = 'generator_stats'
+
+STATS_COLUMNS = ['run_id', 'script', 'stage', 'started_at', 'wall_s', 'cpu_s', 'rows', 'peak_rss_mb']
+
+STATS_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        run_id VARCHAR,
+        script VARCHAR,
+        stage VARCHAR,
+        started_at TIMESTAMP,
+        wall_s DOUBLE,
+        cpu_s DOUBLE,
+        rows BIGINT,
+        peak_rss_mb DOUBLE
+    )
+"""
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS counter so the next reading covers one stage only (Linux)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb():
+    """Peak RSS since the last reset, falling back to the process lifetime peak"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class StageStats:
+    """Records wall time, CPU time, rows and peak RSS per stage.
+
+    Stages may nest; a stage's peak RSS includes that of its children. CPU
+    time is that of the whole process, so it includes DuckDB's threads and
+    any stage running at the same time on another thread. Only the main thread
+    resets the peak RSS counter.
+    """
+
+    def __init__(self, script, run_id=None):
+        self.script = script
+        self.run_id = run_id or uuid.uuid4().hex
+        self.records = []
+        self._local = threading.local()
+
+    @contextmanager
+    def stage(self, name, rows=0):
+        """Time the enclosed block; set record['rows'] inside it if the count is only known at the end"""
+        stack = self._local.__dict__.setdefault('stack', [])
+        if stack:
+            # The parent's peak so far, before the counter is reset for this stage
+            stack[-1]['_peak'] = max(stack[-1]['_peak'], peak_rss_mb())
+        if threading.current_thread() is threading.main_thread():
+            reset_peak_rss()
+        record = {
+            'run_id': self.run_id,
+            'script': self.script,
+            'stage': name,
+            'started_at': datetime.now().isoformat(timespec='milliseconds'),
+            'rows': rows,
+            '_peak': 0.0
+        }
+        stack.append(record)
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            stack.pop()
+            record['wall_s'] = round(time.perf_counter() - wall_start, 6)
+            record['cpu_s'] = round(time.process_time() - cpu_start, 6)
+            record['peak_rss_mb'] = round(max(record.pop('_peak'), peak_rss_mb()), 1)
+            if stack:
+                stack[-1]['_peak'] = max(stack[-1]['_peak'], record['peak_rss_mb'])
+            self.records.append(record)
+
+    def timed(self, name, fn):
+        """Run fn as a stage and count the rows of what it returns"""
+        with self.stage(name) as record:
+            result = fn()
+            record['rows'] = len(result)
+        return result
+
+    def summary(self):
+        """Totals per stage in first-seen order: calls, rows, wall and CPU time, peak RSS"""
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record['stage'], {'calls': 0, 'rows': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'peak_rss_mb': 0.0})
+            total['calls'] += 1
+            total['rows'] += record['rows']
+            total['wall_s'] += record['wall_s']
+            total['cpu_s'] += record['cpu_s']
+            total['peak_rss_mb'] = max(total['peak_rss_mb'], record['peak_rss_mb'])
+        return totals
+
+    def print_summary(self):
+        header = f"{'stage':<28} {'calls':>6} {'rows':>12} {'wall s':>9} {'cpu s':>9} {'rows/s':>12} {'peak MB':>9}"
+        print(header)
+        print('-' * len(header))
+        for stage, total in self.summary().items():
+            rows_per_s = f"{round(total['rows'] / total['wall_s']):,}" if total['rows'] and total['wall_s'] else '-'
+            print(f"{stage:<28} {total['calls']:>6} {total['rows']:>12,} {total['wall_s']:>9.3f} "
+                  f"{total['cpu_s']:>9.3f} {rows_per_s:>12} {total['peak_rss_mb']:>9.1f}")
+
+    def write_jsonl(self, path):
+        """Append one JSON line per stage call"""
+        with open(path, 'a') as f:
+            for record in self.records:
+                f.write(json.dumps({column: record[column] for column in STATS_COLUMNS}) + '\n')
+
+    def write_table(self, conn, table=DEFAULT_STATS_TABLE):
+        """Append one row per stage call to a DuckDB table, creating it if needed"""
+        conn.execute(STATS_TABLE_DDL.format(table=table))
+        if self.records:
+            conn.executemany(
+                f"INSERT INTO {table} VALUES ({', '.join('?' * len(STATS_COLUMNS))})",
+                [[record[column] for column in STATS_COLUMNS] for record in self.records]
+            )
@@ -0,0 +1,6 @@
+import generate_data as gd
+
+def test_enum_types_macro_is_current():
+    """macros/enum_types.sql must be rewritten with --write-enum-macro after ENUM_TYPES changes"""
+    with open(gd.ENUM_MACRO_PATH) as f:
+        assert f.read() == gd.enum_types_macro()
@@ -0,0 +1,50 @@
+import shutil
+import time
+
+import duckdb
+
+import generate_data as gd
+from order_stream import OrderStream
+from SCD2_data_generator import SCD2DataGenerator, replay_change_log
+
+STREAMED_TABLES = ['orders', 'order_items', 'payments']
+
+def _stream_two_flushes(db_path):
+    """Flush one micro-batch of new orders, then one of status events only"""
+    generator = SCD2DataGenerator(db_path)
+    stream = OrderStream(generator, seed=1)
+    created_at = time.time()
+    stream._ingest([(created_at, 20, 0)])
+    stream._ingest([(created_at + 0.01, 0, 5)])
+    return generator, stream
+
+def test_status_only_flush_and_replay(tmp_path):
+    db_path = str(tmp_path / 'stream.duckdb')
+    base_path = str(tmp_path / 'base.duckdb')
+    gd.create_database_and_tables(db_path=db_path, customer_count=50, product_count=10, order_count=100,
+                                  export='none', now=gd._now())
+    shutil.copy(db_path, base_path)
+
+    generator, stream = _stream_two_flushes(db_path)
+    assert stream.counts['orders'] == 20
+    assert stream.counts['status_changes'] == 5
+    logged = dict(generator.conn.execute(
+        "SELECT entity, COUNT(*) FROM change_log WHERE operation = 'insert' GROUP BY entity").fetchall())
+    assert logged == {table: stream.counts[table] for table in STREAMED_TABLES}
+    generator.export_change_log(str(tmp_path / 'changes'))
+    generator.close()
+
+    # The change log alone turns the base database into the streamed one
+    conn = duckdb.connect(base_path)
+    replay_change_log(conn, f"read_parquet('{tmp_path}/changes/**/*.parquet', hive_partitioning = true)")
+    conn.execute(f"ATTACH '{db_path}' AS streamed (READ_ONLY)")
+    for table in STREAMED_TABLES:
+        difference = conn.execute(f"""
+            SELECT COUNT(*) FROM (
+                (SELECT * FROM {table} EXCEPT ALL SELECT * FROM streamed.{table})
+                UNION ALL
+                (SELECT * FROM streamed.{table} EXCEPT ALL SELECT * FROM {table})
+            )
+        """).fetchone()[0]
+        assert difference == 0, table
+    conn.close()
@@ -0,0 +1,20 @@
+{#
+    Every ENUM type in the target must have the values of enum_types(),
+    which generate_data.py writes from ENUM_TYPES. A database generated after
+    ENUM_TYPES changed, without rewriting the macro, fails here.
+#}
+SELECT *
+FROM (
+    {%- for name, values in enum_types().items() %}
+    SELECT
+        '{{ name }}' AS type_name,
+        enum_range(NULL::{{ name }})::VARCHAR[] AS target_values,
+        [
+            {%- for value in values -%}
+            '{{ value | replace("'", "''") }}'{% if not loop.last %}, {% endif %}
+            {%- endfor -%}
+        ]::VARCHAR[] AS macro_values
+    {% if not loop.last %}UNION ALL{% endif %}
+    {%- endfor %}
+) enum_types
+WHERE target_values IS DISTINCT FROM macro_values
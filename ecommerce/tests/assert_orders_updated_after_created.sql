@@ -0,0 +1,8 @@
+{#
+    An order's status can only change after it was placed. Guards the
+    update timestamps of SCD2 batches and of order_stream.py, which stamps
+    each status change with the time of its event.
+#}
+SELECT order_id, created_at, updated_at
+FROM {{ ref('stg__orders') }}
+WHERE updated_at < created_at
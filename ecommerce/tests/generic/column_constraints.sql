@@ -0,0 +1,125 @@
+{#
+    Evaluates every unique, not_null, accepted_values and relationships test
+    declared on a model's columns in one query, so a model needs one test
+    node instead of one per column and test. unique, accepted_values and
+    relationships share a single GROUPING SETS aggregate over the model, with
+    one group per distinct value of each of their columns; not_null checks
+    are filtered counts, which DuckDB answers from column statistics.
+
+    Each failing constraint is one row named after the test it stands in for,
+    with the failure count that test would report, and the test fails on
+    their sum; `--store-failures` keeps the rows. The `where` and severity
+    configs of the individual tests are not applied. `dbt test --selector
+    single_scan_tests` runs these instead of the individual tests, see
+    selectors.yml.
+
+    `--vars 'column_constraints_sample: 10'` checks a TABLESAMPLE of that
+    percentage of the model, for fast pre-merge runs. Counts then cover the
+    sample, relationships are checked for the sampled rows only, and a
+    duplicate is only found when at least two of its rows are sampled.
+#}
+{% test column_constraints(model) %}
+    {{ config(fail_calc='coalesce(sum(failures), 0)') }}
+
+    {%- set supported = ['unique', 'not_null', 'accepted_values', 'relationships'] -%}
+    {%- set checks = [] -%}
+    {%- set grouped_columns = [] -%}
+    {%- if execute -%}
+        {%- set model_node = graph.nodes.values()
+            | selectattr('resource_type', 'in', ['model', 'snapshot', 'seed'])
+            | selectattr('alias', 'equalto', model.identifier)
+            | selectattr('schema', 'equalto', model.schema)
+            | first -%}
+        {%- for node in graph.nodes.values() | sort(attribute='name') -%}
+            {%- if node.resource_type == 'test' and node.get('attached_node') == model_node.unique_id
+                and node.get('column_name') and node.get('test_metadata')
+                and node.test_metadata.name in supported -%}
+                {%- do checks.append(node) -%}
+                {%- if node.test_metadata.name != 'not_null' and node.column_name not in grouped_columns -%}
+                    {%- do grouped_columns.append(node.column_name) -%}
+                {%- endif -%}
+            {%- endif -%}
+        {%- endfor -%}
+    {%- endif -%}
+
+    {%- set sample = var('column_constraints_sample', none) -%}
+    {%- set base = 'sampled' if sample else model -%}
+
+    {%- if checks %}
+WITH
+    {%- if sample %}
+sampled AS MATERIALIZED (
+    SELECT * FROM {{ model }} TABLESAMPLE {{ sample }}%
+),
+    {%- endif %}
+    {%- if grouped_columns %}
+grouped AS (
+    SELECT
+        {%- for column in grouped_columns %}
+        {{ column }},
+        GROUPING({{ column }}) = 0 AS by_{{ loop.index }},
+        {%- endfor %}
+        COUNT(*) AS n
+    FROM {{ base }}
+    GROUP BY GROUPING SETS ({% for column in grouped_columns %}({{ column }}){% if not loop.last %}, {% endif %}{% endfor %})
+),
+    {%- endif %}
+checks AS (
+    {%- for check in checks %}
+        {%- set column = check.column_name -%}
+        {%- set kwargs = check.test_metadata.kwargs -%}
+        {%- set test_type = check.test_metadata.name -%}
+        {%- if test_type != 'not_null' -%}
+            {%- set grouping = 'by_' ~ (grouped_columns.index(column) + 1) -%}
+        {%- endif -%}
+        {%- if test_type == 'relationships' -%}
+            {%- set parent_name = modules.re.match("\s*ref\(\s*['\"](\w+)['\"]\s*\)\s*$", kwargs['to']) -%}
+            {%- if not parent_name -%}
+                {{ exceptions.raise_compiler_error("column_constraints only checks relationships to ref(): " ~ check.name) }}
+            {%- endif -%}
+            {%- set parent = graph.nodes.values()
+                | selectattr('resource_type', 'in', ['model', 'snapshot', 'seed'])
+                | selectattr('name', 'equalto', parent_name.group(1))
+                | first -%}
+        {%- endif %}
+    SELECT '{{ check.name }}' AS test_name, '{{ test_type }}' AS test_type, '{{ column }}' AS column_name,
+        {%- if test_type == 'not_null' %}
+        COUNT(*) AS failures
+    FROM {{ base }}
+    WHERE {{ column }} IS NULL
+        {%- elif test_type == 'unique' %}
+        COUNT(*) AS failures
+    FROM grouped
+    WHERE {{ grouping }} AND {{ column }} IS NOT NULL AND n > 1
+        {%- elif test_type == 'accepted_values' %}
+        COUNT(*) AS failures
+    FROM grouped
+    WHERE {{ grouping }} AND {{ column }} IS NOT NULL
+        AND {{ column }} NOT IN (
+            {%- for value in kwargs['values'] -%}
+            {% if kwargs.get('quote', true) %}'{{ value }}'{% else %}{{ value }}{% endif %}{% if not loop.last %}, {% endif %}
+            {%- endfor -%}
+        )
+        {%- elif test_type == 'relationships' %}
+        COALESCE(SUM(g.n), 0) AS failures
+    FROM (
+        SELECT {{ column }}, n
+        FROM grouped
+        WHERE {{ grouping }} AND {{ column }} IS NOT NULL
+    ) g
+    ANTI JOIN {{ api.Relation.create(database=parent.database, schema=parent.schema, identifier=parent.alias) }} p
+        ON g.{{ column }} = p.{{ kwargs['field'] }}
+        {%- endif %}
+        {%- if not loop.last %}
+    UNION ALL
+        {%- endif %}
+    {%- endfor %}
+)
+SELECT *
+FROM checks
+WHERE failures > 0
+    {%- else %}
+SELECT NULL AS test_name, NULL AS test_type, NULL AS column_name, 0 AS failures
+WHERE false
+    {%- endif %}
+{% endtest %}
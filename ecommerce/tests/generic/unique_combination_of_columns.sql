@@ -0,0 +1,13 @@
+{#
+    Fails for every combination of the given columns that occurs in more
+    than one row, e.g. a model's declared grain. NULLs count as equal, as in
+    GROUP BY.
+#}
+{% test unique_combination_of_columns(model, combination_of_columns) %}
+SELECT
+    {{ combination_of_columns | join(', ') }},
+    COUNT(*) AS num_rows
+FROM {{ model }}
+GROUP BY {{ combination_of_columns | join(', ') }}
+HAVING COUNT(*) > 1
+{% endtest %}